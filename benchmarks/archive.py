@@ -0,0 +1,167 @@
+"""End to end archive throughput against local stand-ins, no network needed.
+
+Run from the repository root: python benchmarks/archive.py [options]
+yt-dlp extraction is replaced by a fake extractor and RYD, thumbnails and
+the Wayback machine by a local HTTP server, all with configurable latency
+and error rates. Archive.video, history, playlist and dump run in a
+scratch directory and are reported as videos/sec, p50/p99 fetch and
+store latency per video, peak RSS and database size.
+"""
+import sys, os, io, json, time, random, shutil, tempfile, argparse, resource, threading, logging, contextlib
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+import yt_dlp
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """RYD votes, thumbnails and the Wayback CDX index"""
+    settings = None
+
+    def do_GET(self):
+        s, url = self.settings, urllib.parse.urlsplit(self.path)
+        time.sleep(s.http_latency / 1000)
+        if random.random() < s.http_errors: return self.reply(500, b"")
+
+        if url.path.startswith("/ryd/"):
+            video_id = urllib.parse.parse_qs(url.query)["videoId"][0]
+            body = json.dumps({"id": video_id, "likes": 100, "dislikes": 3, "viewCount": 5000, "rating": 4.9}).encode()
+        elif url.path.startswith("/thumbnails/"):
+            body = os.urandom(16) * (s.thumbnail_size // 16)
+        elif url.path == "/cdx":
+            video_id = urllib.parse.parse_qs(url.query)["url"][0][-11:]
+            body = json.dumps([["timestamp"], ["20200101000000"]] if fate(video_id, s)[1] else []).encode()
+        else: return self.reply(404, b"")
+        self.reply(200, body)
+
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): pass
+
+
+# Whether a video is lost and, if so, whether it has a Wayback snapshot
+def fate(video_id, s):
+    rng = random.Random(video_id)
+    return rng.random() < s.errors, rng.random() < s.wayback
+
+
+def fake_extractor(s, server):
+    def extract_info(self, url, download=False, **kwargs):
+        time.sleep(s.latency / 1000)
+        video_id, wayback = url[-11:], url.startswith(utils.WAYBACK)
+        lost, snapshot = fate(video_id, s)
+        if lost and not (wayback and snapshot):
+            raise yt_dlp.utils.DownloadError(f"ERROR: [youtube] {video_id}: Video unavailable")
+
+        comments = [{"id": f"{video_id}.{n}", "author_id": f"UC{n % 97:022d}", "author": f"user {n % 97}",
+            "text": "comment " * 20, "like_count": n, "is_favorited": False, "author_is_uploader": False,
+            "parent": "root" if n % 4 == 0 else f"{video_id}.{n - n % 4}", "timestamp": 1600000000 + n}
+            for n in range(s.comments)] if self.params.get("getcomments") else None
+        channel = f"UC{int(video_id[5:]) % 50:022d}"
+        return {"id": video_id, "fulltitle": f"Video {video_id}", "description": "description " * 50,
+            "channel_id": channel, "channel": "channel", "uploader_id": "@uploader",
+            "channel_url": f"https://www.youtube.com/channel/{channel}", "thumbnail": f"{server}/thumbnails/{video_id}.jpg?v=1",
+            "duration": 300, "availability": "public", "height": 1080, "width": 1920, "fps": 30,
+            "upload_date": "20200102", "filesize_approx": 10**7, "tags": [f"tag{n}" for n in range(8)],
+            "categories": ["Music"], "view_count": 5000, "comments": comments}
+    return extract_info
+
+
+def percentile(values, p):
+    if not values: return 0
+    values = sorted(values)
+    return values[min(len(values)-1, int(len(values) * p / 100))]
+
+
+def timed(method, samples):
+    def wrapper(self, video_id, *args, **kwargs):
+        started = time.perf_counter()
+        try: return method(self, video_id, *args, **kwargs)
+        finally: samples.append(time.perf_counter() - started)
+    return wrapper
+
+
+def report(name, videos, elapsed, fetches, stores):
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    size = sum(os.path.getsize(f) for f in os.listdir(".") if f.startswith("youtube.db")) / 2**20
+    print(f"{name:9} {videos:6} {videos/elapsed:9.1f} "
+        f"{percentile(fetches, 50)*1000:8.1f} {percentile(fetches, 99)*1000:8.1f} "
+        f"{percentile(stores, 50)*1000:8.2f} {percentile(stores, 99)*1000:8.2f} {peak:8.1f} {size:8.2f}")
+    fetches.clear(); stores.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=200, help="videos per scenario")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=20, help="extractor latency (ms)")
+    parser.add_argument("--http-latency", type=float, default=5, help="stand-in latency (ms)")
+    parser.add_argument("--errors", type=float, default=0.05, help="fraction of lost videos")
+    parser.add_argument("--wayback", type=float, default=0.5, help="fraction of lost videos with a snapshot")
+    parser.add_argument("--http-errors", type=float, default=0, help="fraction of 500 responses")
+    parser.add_argument("--comments", type=int, default=50, help="comments per video")
+    parser.add_argument("--thumbnail-size", type=int, default=20000, help="thumbnail bytes")
+    parser.add_argument("--scenarios", default="video,history,playlist,dump")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    s = parser.parse_args()
+
+    # Scratch archive with its own configs
+    scratch = tempfile.mkdtemp(prefix="yark-bench-")
+    shutil.copy(os.path.join(REPO, "schema.sql"), scratch)
+    shutil.copytree(os.path.join(REPO, "migrations"), os.path.join(scratch, "migrations"))
+    os.chdir(scratch)
+    with open("configs.json", "w") as config_file:
+        json.dump({"workers": s.workers, "rate": 10000, "retries": 1}, config_file)
+
+    StandIn.settings = s
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    server = f"http://127.0.0.1:{httpd.server_port}"
+
+    logging.disable(logging.CRITICAL)
+    import utils, cmds
+    from cmds import archive
+    utils.RYD_API, utils.WAYBACK_CDX = f"{server}/ryd/", f"{server}/cdx"
+    yt_dlp.YoutubeDL.extract_info = fake_extractor(s, server)
+
+    fetches, stores = [], []
+    archive.Archive._Archive__fetch = timed(archive.Archive._Archive__fetch, fetches)
+    archive.Archive._Archive__store = timed(archive.Archive._Archive__store, stores)
+
+    print(f"{'scenario':9} {'videos':>6} {'videos/s':>9} {'fetch50':>8} {'fetch99':>8} "
+        f"{'store50':>8} {'store99':>8} {'rss MB':>8} {'db MB':>8}")
+    ids = (f"bench{n:06d}" for n in range(10**6))
+    for scenario in s.scenarios.split(","):
+        started, out = time.perf_counter(), io.StringIO()
+        with contextlib.redirect_stdout(out):
+            if scenario == "video":
+                for i in range(s.videos): cmds.run(cmds.Archive(), ["video", next(ids)])
+            elif scenario == "history":
+                # Every video watched once and a fifth of them watched again
+                videos = [next(ids) for i in range(s.videos)]
+                watched = videos + videos[:s.videos // 5]
+                with open("watch-history.json", "w") as history:
+                    json.dump([{"titleUrl": f"https://www.youtube.com/watch?v={id}",
+                        "time": f"2021-01-01T10:{n // 60 % 60:02d}:{n % 60:02d}.000Z"} for n, id in enumerate(watched)], history)
+                cmds.run(cmds.Archive(), ["history", "watch-history.json"])
+            elif scenario == "playlist":
+                with open("Bench videos.csv", "w") as playlist:
+                    playlist.write("Video ID,Playlist Video Creation Timestamp\n")
+                    for i in range(s.videos): playlist.write(f"{next(ids)},2022-03-01T20:16:51+00:00\n")
+                cmds.run(cmds.Archive(), ["playlist", "Bench", "videos.csv"])
+            elif scenario == "dump":
+                cmds.run(cmds.Archive(), ["dump", "thumbnails"])
+            else: raise SystemExit(f"Unknown scenario {scenario}")
+
+        count = len(os.listdir("thumbnails")) if scenario == "dump" else s.videos
+        report(scenario, count, time.perf_counter() - started, fetches, stores)
+
+    httpd.shutdown()
+    if s.keep: print(f"Scratch archive kept in {scratch}")
+    else: shutil.rmtree(scratch)
@@ -0,0 +1,32 @@
+"""Per-video YoutubeDL setup overhead, fresh instance vs ExtractorPool.
+
+Run from the repository root: python benchmarks/extractor_pool.py [iterations]
+Nothing is extracted, only the cost of getting a ready YoutubeDL is measured.
+"""
+import sys, os, time, yt_dlp
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import YtLogger
+from extractors import ExtractorPool
+
+OPTIONS = {"getcomments": True, "quiet": True, "logger": YtLogger(), "extract_flat": "in_playlist"}
+
+
+def per_video(setup, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        with setup(OPTIONS) as ydlp: pass
+    return (time.perf_counter() - started) / iterations
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pool = ExtractorPool()
+
+    fresh = per_video(yt_dlp.YoutubeDL, iterations)
+    pooled = per_video(pool.get, iterations)
+    pool.close()
+
+    print(f"fresh YoutubeDL: {fresh*1000:.3f} ms/video")
+    print(f"ExtractorPool:   {pooled*1000:.3f} ms/video")
+    print(f"speedup:         {fresh/pooled:.0f}x")
@@ -0,0 +1,67 @@
+"""Hot query timings on a synthetic archive, before and after migrating.
+
+Run from the repository root: python benchmarks/indexes.py [videos]
+The archive is built in memory with 20 comments, 5 tags and 4 history
+entries per video, then each query is timed on the version 1 schema and
+again once the migrations have been applied.
+"""
+import sys, os, time, random, sqlite3
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+
+def build(videos):
+    db = sqlite3.connect(":memory:")
+    db.row_factory = database.dict_factory
+    db.execute("PRAGMA foreign_keys = ON")
+    with open("schema.sql", "r") as schema:
+        db.executescript(schema.read())
+    db.execute("PRAGMA user_version = 1")
+
+    ids = [f"{n:011d}" for n in range(videos)]
+    db.execute("INSERT INTO users VALUES ('u', 'u')")
+    db.execute("INSERT INTO channels VALUES ('c', 'u', 'c', 0, 'https://c')")
+    db.executemany("INSERT INTO videos(video_id, channel, availability) VALUES (?, 'c', ?)",
+        ((id, "lost" if n % 50 == 0 else "public") for n, id in enumerate(ids)))
+    db.executemany("INSERT INTO tags VALUES (?)", ((f"tag{n}",) for n in range(1000)))
+    db.executemany("INSERT INTO video_tags(video, tag) VALUES (?,?)",
+        ((id, f"tag{random.randrange(1000)}") for id in ids for i in range(5)))
+    db.executemany("INSERT INTO comments VALUES (?,?,'u','text',0,0,0,NULL,0)",
+        ((f"{id}.{i}", id) for id in ids for i in range(20)))
+    db.executemany("INSERT INTO history(video, watched) VALUES (?,?)",
+        ((id, random.randrange(1_500_000_000, 1_700_000_000)) for id in ids for i in range(4)))
+    db.commit()
+    return db, ids
+
+
+def timed(db, ids, runs=200):
+    sample = random.sample(ids, runs)
+    queries = {
+        "history lookup": lambda id: db.execute("SELECT 1 FROM history WHERE video==? AND watched==?", (id, 0)).fetchone(),
+        "video delete (cascade)": lambda id: db.execute("DELETE FROM videos WHERE video_id == ?", (id,)),
+        "lost videos": lambda id: db.execute("SELECT video_id FROM videos WHERE availability == 'lost'").fetchall(),
+    }
+
+    results = {}
+    for name, query in queries.items():
+        started = time.perf_counter()
+        for id in sample: query(id)
+        results[name] = (time.perf_counter() - started) / runs * 1000
+    db.rollback()
+    return results
+
+
+if __name__ == "__main__":
+    videos = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    random.seed(0)
+    db, ids = build(videos)
+    print(f"{videos} videos, {videos*20} comments, {videos*4} history entries")
+
+    before = timed(db, ids)
+    started = time.perf_counter()
+    database.migrate(db)
+    print(f"migration took {time.perf_counter() - started:.2f} s\n")
+    after = timed(db, ids)
+
+    for name in before:
+        print(f"{name:24} {before[name]:9.3f} ms -> {after[name]:7.3f} ms")
@@ -0,0 +1,47 @@
+"""Startup time of yark for scripted and cron use.
+
+Run from the repository root: python benchmarks/startup.py [runs] [target ms]
+Each case starts a fresh interpreter in a scratch directory, the median
+wall time is reported and the script exits with 1 when 'help' is
+slower than the target, so it can guard against slow imports creeping in.
+"""
+import sys, os, time, shutil, tempfile, subprocess, statistics
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "python": [],
+    "import cmds": ["-c", f"import sys; sys.path.insert(0, {REPO!r}); import cmds"],
+    "help": [os.path.join(REPO, "yark.py")],
+    "config": [os.path.join(REPO, "yark.py")],
+    "archive jobs": [os.path.join(REPO, "yark.py")],
+}
+INPUT = {"help": "help\nexit\n", "config": "config\nexit\n", "archive jobs": "archive jobs\nexit\n"}
+
+
+def median_ms(args, stdin, runs, cwd):
+    times = []
+    for i in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *(args or ["-c", "pass"])], input=stdin, cwd=cwd,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, text=True, check=True)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    target = float(sys.argv[2]) if len(sys.argv) > 2 else 150
+
+    scratch = tempfile.mkdtemp(prefix="yark-startup-")
+    shutil.copy(os.path.join(REPO, "schema.sql"), scratch)
+    shutil.copytree(os.path.join(REPO, "migrations"), os.path.join(scratch, "migrations"))
+    try:
+        results = {name: median_ms(args, INPUT.get(name, ""), runs, scratch) for name, args in CASES.items()}
+    finally:
+        shutil.rmtree(scratch)
+
+    for name, ms in results.items():
+        print(f"{name:13} {ms:8.1f} ms")
+    if results["help"] > target:
+        print(f"'help' took longer than {target:.0f} ms")
+        sys.exit(1)
@@ -0,0 +1,43 @@
+"""Correctness and throughput of utils.parse_timestamp against dateutil.
+
+Run from the repository root: python benchmarks/timestamps.py [iterations]
+Every string in the corpus must parse to the same timestamp as dateutil.
+"""
+import sys, os, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dateutil.parser import parse
+import utils
+
+CORPUS = [
+    # Takeout watch history
+    "2021-01-01T10:00:00Z", "2021-01-01T10:00:00.1Z", "2021-01-01T10:00:00.123Z",
+    "2023-07-14T23:59:59.999999Z", "2016-02-29T00:00:00.000Z",
+    # Takeout playlist CSVs and ISO offsets
+    "2022-03-14T20:16:51+00:00", "2022-03-14T20:16:51-05:30", "2022-03-14 20:16:51+02:00",
+    # Local playlists (str(datetime.now()))
+    "2024-05-01 12:34:56.123456", "2024-05-01 12:34:56",
+    # yt-dlp upload_date / modified_date
+    "20200102", "19991231", "20240229",
+    # Anything else goes through dateutil
+    "2021-01-01T10:00:00 UTC", "Jan 5 2021 10:00", "5 January 2021",
+]
+
+
+def throughput(parser, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        for text in CORPUS[:13]: parser(text)
+    return iterations * 13 / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    for text in CORPUS:
+        expected, got = parse(text).timestamp(), utils.parse_timestamp(text)
+        assert got == expected, f"{text}: {got} != {expected}"
+    print(f"{len(CORPUS)} formats match dateutil")
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    fast = throughput(utils.parse_timestamp, iterations)
+    slow = throughput(lambda text: parse(text).timestamp(), iterations)
+    print(f"dateutil:        {slow:10.0f} timestamps/s")
+    print(f"parse_timestamp: {fast:10.0f} timestamps/s ({fast/slow:.0f}x)")
@@ -0,0 +1,36 @@
+import os, json, gzip, time
+import utils
+
+
+class RawCache:
+    """Compressed raw extraction results keyed by video ID.
+
+    Every entry holds the sanitized yt-dlp info dict and the RYD response
+    as gzipped JSON (ab/abcdefghijk.json.gz), so videos can be refined and
+    stored again without downloading them. Entries older than `ttl`
+    seconds are ignored unless asked for explicitly.
+    """
+    def __init__(self, root="raw_cache", ttl=30*86400):
+        self.root, self.ttl = root, ttl
+
+    def path(self, video_id):
+        return os.path.join(self.root, video_id[:2], f"{video_id}.json.gz")
+
+    def get(self, video_id, max_age=None):
+        # Returns the entry or None when missing or stale, max_age=-1 accepts any age
+        try:
+            with gzip.open(self.path(video_id), "rt", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (FileNotFoundError, EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+            return None
+
+        max_age = self.ttl if max_age is None else max_age
+        if max_age >= 0 and entry["fetched"] + max_age < time.time(): return None
+        return entry
+
+    def put(self, video_id, info, ryd=None, fetched=None):
+        # fetched is when info was extracted (default: now)
+        path = self.path(video_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with utils.atomic_path(path) as temporary, gzip.open(temporary, "wt", encoding="utf-8") as file:
+            json.dump({"fetched": fetched or time.time(), "info": info, "ryd": ryd}, file)
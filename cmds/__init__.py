@@ -1,6 +1,16 @@
-import sys, inspect
-from cmds.configs import Config
-from cmds.archive import Archive, Unarchive
+import sys, importlib
+
+# Commands are imported on first use so 'help' or 'config' don't
+# pay for yt-dlp, requests and opening the database
+COMMANDS = {"Config": "cmds.configs", "Archive": "cmds.archive", "Unarchive": "cmds.archive", "Search": "cmds.search", "Export": "cmds.export", "Stats": "cmds.stats"}
+
+def __getattr__(name):
+    if name in ("archive", "configs", "search", "export", "stats"): return importlib.import_module(f"{__name__}.{name}")
+    if name not in COMMANDS: raise AttributeError(f"module {__name__} has no attribute {name}")
+    cmd = globals()[name] = getattr(importlib.import_module(COMMANDS[name]), name)
+    return cmd
+
+def __dir__(): return sorted(list(globals()) + list(COMMANDS))
 
 
 # Global run command
@@ -40,6 +50,9 @@ class Help:
     Commands (use <command> help to print additional help):
       archive    - Archive something to the database
       unarchive  - Unarchive something from the database
+      search     - Search the archive
+      export     - Export the archive to NDJSON, CSV or Parquet
+      stats      - Statistics of your watch history
       config     - Change your configurations
       help       - Print information about any command
     """
@@ -51,6 +64,6 @@ class Help:
 
         # Get command docs
         cmd = getattr(sys.modules[__name__], cmd, err)
-        if inspect.isclass(cmd):
+        if isinstance(cmd, type):
             return cmd().__doc__
         raise err
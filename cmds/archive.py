@@ -1,27 +1,115 @@
-import sys, os, json, csv, sqlite3, requests, time, yt_dlp, datetime, logging
-from dateutil.parser import *
+import os, json, csv, sqlite3, requests, time, yt_dlp, datetime, logging, atexit, shutil, hashlib, threading, socket
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from functools import partial
+from contextlib import contextmanager
 import urllib.parse
 
 from pathlib import Path
 
 
-import utils
+import utils, database
+from extractors import ExtractorPool
+from net import Session, RateLimiter, Throttled
+import net
+from thumbnails import ThumbnailStore
+from cache import RawCache
+from metrics import Metrics
 from .configs import options, configs
 
-# Initialize database
-def dict_factory(cursor, row):
-    columns = [col[0] for col in cursor.description]
-    return {key: value for key, value in zip(columns, row)}
-
-try:
-    # Open the database
-    db = sqlite3.connect("youtube.db")
-    db.row_factory = dict_factory
-    with open("schema.sql", "r") as schema:
-        db.executescript(schema.read())
-except FileNotFoundError as e:
-    logging.critical("Database schema not found.")
-    sys.exit()
+# Opened and migrated on first use
+db = database.db
+
+# Stage timings and counters, see 'archive stats'
+metrics = Metrics()
+
+class Batch:
+    """Group bulk writes into as few transactions as possible.
+
+    Every entry (a video and the rows referring to it) is written inside
+    its own savepoint, so an entry that fails is rolled back on its own.
+    Entries are committed together every `size` entries or `interval`
+    seconds, an interrupted run loses at most one uncommitted batch.
+    """
+    def __init__(self, connection, size, interval):
+        self.connection, self.size, self.interval = connection, size, interval
+        self.pending, self.committed = 0, time.perf_counter()
+
+    @contextmanager
+    def entry(self):
+        if not self.connection.in_transaction: self.connection.execute("BEGIN")
+        self.connection.execute("SAVEPOINT entry")
+        try: yield
+        except BaseException:
+            self.connection.execute("ROLLBACK TO entry")
+            self.connection.execute("RELEASE entry")
+            raise
+        self.connection.execute("RELEASE entry")
+        self.pending += 1
+
+        if self.pending >= self.size or time.perf_counter() - self.committed >= self.interval:
+            self.commit()
+
+    def commit(self):
+        with metrics.span("commit"): self.connection.commit()
+        self.pending, self.committed = 0, time.perf_counter()
+
+batch = Batch(db, configs["commit_every"], configs["commit_interval"])
+
+
+class WaybackMisses:
+    """Videos the Wayback machine has no snapshot of.
+
+    Loaded once by the writer so workers can check it without touching
+    the database, new misses are kept aside until the writer saves them.
+    Entries older than `ttl` seconds are ignored so videos are looked up again.
+    """
+    def __init__(self, connection, ttl):
+        self.connection, self.ttl = connection, ttl
+        self.__misses, self.__pending, self.__lock = None, {}, threading.Lock()
+
+    def load(self):
+        if self.__misses is not None: return
+        misses = {row["video"]: row["checked"] for row in self.connection.execute(
+            "SELECT video, checked FROM wayback_misses WHERE checked > ?", (time.time() - self.ttl,))}
+        with self.__lock:
+            self.__misses = misses | self.__pending
+
+    def __contains__(self, video_id):
+        with self.__lock:
+            return (self.__misses or {}).get(video_id, 0) > time.time() - self.ttl
+
+    def add(self, video_id):
+        with self.__lock:
+            self.__pending[video_id] = int(time.time())
+            if self.__misses is not None: self.__misses[video_id] = self.__pending[video_id]
+
+    def save(self):
+        with self.__lock:
+            pending, self.__pending = self.__pending, {}
+        self.connection.executemany("INSERT OR REPLACE INTO wayback_misses VALUES(?,?)", pending.items())
+
+wayback_misses = WaybackMisses(db, configs["wayback_recheck_days"] * 86400)
+
+# Why lost videos couldn't be extracted, noted by the workers for the writer
+lost_errors = {}
+# Lost videos are checked again after a day, then twice as late every time
+LOST_RECHECK, LOST_RECHECK_MAX = 86400, 86400*128
+# Queue worker attempts per video, seconds before a failed video is retried
+# (times its attempts) and seconds between polls of an empty queue
+QUEUE_ATTEMPTS, QUEUE_RETRY, QUEUE_POLL = 3, 60, 5
+# Seconds before a video that failed refreshing is tried again, and failures
+# in a row that stop a refresh (the hosts are down or throttling us)
+REFRESH_RETRY, REFRESH_FAILURES = 3600, 10
+
+# Shared yt-dlp instances and HTTP connections
+extractors = ExtractorPool()
+atexit.register(extractors.close)
+limiter = RateLimiter(configs["rate"])
+http = Session(limiter, configs["connections"], configs["timeout"], configs["retries"])
+atexit.register(http.close)
+thumbnail_store = ThumbnailStore()
+raw_cache = RawCache(ttl=configs["raw_cache_days"] * 86400)
 
 # https://www.youtube.com/watch?v=qOgldkETcxk
 class Archive:
@@ -38,19 +126,87 @@ class Archive:
       This method accepts youtube playlist IDs and
       Google takout playlist CSVs.
 
+    sync: archive sync [playlist id / filepath]
+      Bring an archived playlist up to date. Only
+      added and removed videos are written, kept
+      videos keep their added timestamps and only
+      videos not archived yet are fetched. An
+      unchanged playlist is detected right away.
+
     history: archive history [filepath]
       Archive every video from a watch history JSON file
       (from Google takeout). This method requires a
       filepath to said history file.
 
+      Playlists and history are fetched by as many
+      parallel workers as the 'workers' config allows.
+
+    refresh: archive refresh [count] [minutes]
+      Update the views, likes, dislikes and rating
+      of videos not refreshed for 'refresh_days',
+      stalest and most viewed first. Only ratings
+      are fetched (no comments or thumbnails),
+      optionally up to a count or for a number
+      of minutes. Failed videos are tried again
+      an hour later, the run stops when YouTube
+      keeps throttling or failing.
+
+    replay: archive replay [video id]
+      Store videos again from the raw cache (enable
+      'raw_cache') without downloading anything,
+      thumbnails are kept. Replays every archived
+      video by default.
+
     dump: archive dump thumbnails
       A sub-command used to dump things to disk.
       It is only used for dumping thumbnails and it's
       very likely this will be removed from this command
       at some point in the future.
 
-    lost: archive lost
-      re-attempt to archive all lost videos.
+    store: archive store thumbnails
+      Move the thumbnails saved in the database to
+      the external thumbnail store and shrink the
+      database. Enable 'thumbnail_store' to keep
+      new thumbnails there as well.
+
+    lost: archive lost [count] [minutes]
+      re-attempt to archive lost videos. Each video is
+      re-checked after a day, then twice as late after
+      every failed attempt. Only videos due are tried,
+      likeliest to be recovered first, optionally up
+      to a count or for a number of minutes.
+
+    stats: archive stats [prometheus [file] / reset]
+      Show the time spent in each stage (extract,
+      wayback, thumbnail, ryd, refine, db_write,
+      commit) and counters since yark was started.
+      'prometheus' writes them in the Prometheus
+      text format (default: metrics.prom).
+
+    work: archive work [minutes]
+      With 'queue' on, history, playlist and sync
+      only queue the videos to archive. Workers,
+      any number of yark processes sharing the
+      database, lease videos from the queue and
+      archive them. A worker stops once the queue
+      is empty, or keeps waiting for more videos
+      for a number of minutes. Videos of a worker
+      that died are handed out again once its
+      lease ('lease_minutes') expires.
+
+    queue: archive queue [retry]
+      Show the queue and its workers, 'retry'
+      queues failed videos again.
+
+    resume: archive resume [job id]
+      History, playlist, sync and lost runs are journaled
+      as jobs. Running the same command again on the
+      same input continues an interrupted job, this
+      method resumes a job by ID (default: latest).
+
+    jobs: archive jobs [count]
+      List the latest jobs with their progress
+      and throughput.
     """
     def help(self, args): return self.__doc__
     def default(self): return self.__doc__
@@ -59,33 +215,94 @@ class Archive:
         utils.is_video(id)
 
         logging.info("Extracting data")
-        with yt_dlp.YoutubeDL({"getcomments":configs["comments"]} | options) as ydlp:
+        with extractors.get({"getcomments":configs["comments"]} | options) as ydlp:
             try:
-                info = ydlp.extract_info(id, download=False)
+                with metrics.span("extract"): info = self.__extract(ydlp, id)
             except yt_dlp.utils.DownloadError as e:
+                lost_errors[id] = self.__error_class(e)
                 logging.info("Searching the Wayback machine")
             else: return info
 
-        for i in range(3):
+            with metrics.span("wayback"):
+                # Only attempt a recovery if the video was ever snapshotted
+                if id in wayback_misses:
+                    logging.warning("No Wayback snapshot (cached), video lost")
+                    return
+                snapshot = self.__wayback_snapshot(id)
+                if snapshot == "":
+                    wayback_misses.add(id)
+                    logging.warning("No Wayback snapshot, video lost")
+                    return
+
+                snapshot = f"{snapshot}/" if snapshot else ""
+                for i in range(3):
+                    try:
+                        # Attempt to get video from the wayback machine
+                        info = self.__extract(ydlp, f"{utils.WAYBACK}{snapshot}{utils.YOUTUBE}watch?v={id}")
+                        info["availability"] = "recovered"
+                        return info
+                    except yt_dlp.utils.DownloadError as e:
+                        logging.info(f"Retrying, {2-i} attempts left")
+                        if i < 2: utils.time.sleep(net.backoff(i, base=2))
+
+        logging.warning("Failed recovering video")
+
+
+    def __error_class(self, error):
+        message = str(error).lower()
+        if "private" in message: return "private"
+        if any(word in message for word in ("removed", "terminated", "no longer available", "copyright")): return "removed"
+        if "unavailable" in message: return "unavailable"
+        return "error"
+
+
+    def __wayback_snapshot(self, id):
+        # Timestamp of the latest good snapshot, "" if there is none
+        # and None if the Wayback machine couldn't be asked
+        try:
+            rows = http.get(utils.WAYBACK_CDX, params={"url": f"youtube.com/watch?v={id}", "output": "json",
+                "fl": "timestamp", "filter": "statuscode:200", "limit": -1}).json()
+        except Throttled: raise
+        except requests.RequestException as e:
+            logging.error(f"Wayback availability check failed: {e}")
+            return None
+        return rows[-1][0] if len(rows) > 1 else ""
+
+
+    def __extract(self, ydlp, url):
+        # Throttling is retried by the rate limiter and raised as Throttled
+        # if it persists, so throttled videos aren't mistaken for lost ones
+        def request():
             try:
-                # Attempt to get video from the wayback machine
-                info = ydlp.extract_info(f"{utils.WAYBACK}{utils.YOUTUBE}watch?v={id}", download=False)
-                info["availability"] = "recovered"
-                return info
+                return ydlp.extract_info(url, download=False)
             except yt_dlp.utils.DownloadError as e:
-                logging.info(f"Retrying, {2-i} attempts left")
-                utils.time.sleep(2)
+                if net.THROTTLED.search(str(e)): raise Throttled(str(e))
+                raise
 
-        logging.warning("Failed recovering video")
+        host = urllib.parse.urlsplit(url).hostname or urllib.parse.urlsplit(utils.YOUTUBE).hostname
+        return limiter.run(host, request)
 
 
-    def __refine_metadata(self, info):
+    def __get_ryd(self, id):
+        try:
+            # Get video rating
+            with metrics.span("ryd"): response = http.get(f"{utils.RYD_API}Votes?videoId={id}")
+            metrics.count("bytes_downloaded", len(response.content))
+            ryd = response.json()
+            if not ryd.get("id"): raise requests.RequestException("Failed getting ratings")
+            return ryd
+        except requests.RequestException as e:
+            logging.error(e)
+
+
+    def __refine_metadata(self, info, ryd, thumbnails=True):
         # Download thumbnail
         info["thumbnail_url"] = info.get("thumbnail")
-        if configs["thumbnails"] and info["thumbnail_url"]:
+        if thumbnails and configs["thumbnails"] and info["thumbnail_url"]:
             logging.info("Downloading video thumbnail")
             try:
-                thumbnail = requests.get(info["thumbnail_url"].split("?")[0])
+                with metrics.span("thumbnail"): thumbnail = http.get(info["thumbnail_url"].split("?")[0])
+                metrics.count("bytes_downloaded", len(thumbnail.content))
                 thumbnail.raise_for_status()
                 if not thumbnail.content: raise
                 info["thumbnail"] = thumbnail.content
@@ -94,14 +311,12 @@ class Archive:
                 info["thumbnail"] = None
         else: info["thumbnail"] = None
 
-        try:
-            # Get video rating
-            ryd = requests.get(f"{utils.RYD_API}Votes?videoId={info['id']}", timeout=1).json()
-            if not ryd.get("id"): raise requests.RequestException("Failed getting ratings")
-        except requests.RequestException as e:
-            logging.error(e)
-            ryd = {}
+        # Move thumbnail to the external store
+        info["thumbnail_hash"] = None
+        if configs["thumbnail_store"] and info["thumbnail"]:
+            info["thumbnail_hash"], info["thumbnail"] = thumbnail_store.put(info["thumbnail"]), None
 
+        ryd, started = ryd or {}, time.perf_counter()
         if info.get("description") == utils.DEFAULT_DESC: info["description"] = ""
         info["age_limit"] = info.get("age_limit")
         info["live_status"] = info.get("live_status")
@@ -109,7 +324,7 @@ class Archive:
         info["width"] = info.get("width")
         info["audio_channels"] = info.get("audio_channels")
         info["filesize"] = info.pop("filesize_approx") if info.get("filesize_approx") else None
-        info["upload_date"] = parse(info["upload_date"]).timestamp() if info.get("upload_date") else None
+        info["upload_date"] = utils.parse_timestamp(info["upload_date"]) if info.get("upload_date") else None
         info["category"] = info["categories"][0] if info.get("categories") else None
         info["likes"] = (ryd.get("likes") or info.get("like_count"))
         info["dislikes"] = ryd.get("dislikes")
@@ -117,28 +332,109 @@ class Archive:
         info["rating"] = ryd.get("rating")
         info["comments"] = info.get("comments")
         info["channel_follower_count"] = info.get("channel_follower_count")
+        metrics.observe("refine", time.perf_counter() - started)
         return info
 
 
+    def __fetch(self, video_id, replay=False):
+        # Network only, safe to run in a worker thread. When replaying,
+        # videos are only read from the raw cache and thumbnails are kept
+        raw = raw_cache.get(video_id, -1 if replay else None) if configs["raw_cache"] or replay else None
+        if raw and configs["comments"] and raw["info"].get("comments") is None and not replay: raw = None
+        if raw: info, ryd = raw["info"], raw["ryd"]
+        elif replay: return None
+        else:
+            info, ryd = self.__get_video(video_id), None
+            if not info: return None
+            if configs["raw_cache"]: info = yt_dlp.YoutubeDL.sanitize_info(info)
+
+        if ryd is None and not replay:
+            ryd = self.__get_ryd(info["id"])
+            # A cached entry keeps the age of its info when only RYD was fetched
+            if configs["raw_cache"] and not (raw and ryd is None): raw_cache.put(video_id, info, ryd, raw["fetched"] if raw else None)
+        return self.__refine_metadata(info, ryd, thumbnails=not replay)
+
+
+    def __prefetch(self, entries, archived=None, fetcher=None, queue=False):
+        # Yield (entry, fetch) in input order for entries starting with a video ID,
+        # fetch returns the refined metadata or is None when the video is already archived or queued.
+        # With several workers videos are fetched ahead on a thread pool while
+        # the caller stays the only thread writing to the database.
+        # Videos left to the queue's workers aren't fetched ahead.
+        if archived is None: archived = self.__archived_ids()
+        fetcher, workers = fetcher or self.__fetch, configs["workers"]
+        wayback_misses.load()
+        pool = ThreadPoolExecutor(workers) if workers > 1 and not queue else None
+        lookahead, window = workers*2 if pool else 0, deque()
+        try:
+            for entry in entries:
+                video_id, fetch = entry[0], None
+                if video_id and video_id not in archived:
+                    archived.add(video_id)
+                    if pool: fetch = pool.submit(fetcher, video_id).result
+                    else: fetch = partial(fetcher, video_id)
+
+                window.append((entry, fetch))
+                if len(window) > lookahead: yield window.popleft()
+            while window: yield window.popleft()
+        finally:
+            if pool: pool.shutdown(wait=False, cancel_futures=True)
+
+
+    def __archived_ids(self):
+        return {row["video_id"] for row in db.execute("SELECT video_id FROM videos")}
+
+
+    def __archived(self, video_id):
+        return db.execute("SELECT 1 FROM videos WHERE video_id == ?", (video_id,)).fetchone() is not None
+
+
+    def __archive_fetched(self, video_id, fetch):
+        if not video_id: raise ValueError("Missing video ID")
+        if fetch and configs["queue"]: return self.__enqueue(video_id)
+        if fetch: return self.__store(video_id, fetch())
+        print("Video already archived, skipping.")
+        return "skipped"
+
+
+    def __enqueue(self, video_id):
+        # Failed videos are given another chance when queued again
+        db.execute("""INSERT INTO queue(video) VALUES (?) ON CONFLICT(video) DO UPDATE
+            SET status = 'pending', attempts = 0, error = NULL WHERE status == 'failed'""", (video_id,))
+        metrics.count("videos_queued")
+        print("Video queued for the workers.")
+        return "queued"
+
+
     def video(self, video_id, force=True):
         if not video_id: raise ValueError("Missing video ID")
-        video_id, cur = video_id[0], db.cursor()
-        if cur.execute("SELECT video_id FROM videos WHERE video_id == ?",
-            (video_id,)).fetchone() and not force:
+        video_id = video_id[0]
+        if self.__archived(video_id) and not force:
             print("Video already archived, skipping.")
             return
 
-        v = self.__get_video(video_id)
+        wayback_misses.load()
+        with batch.entry(): self.__store(video_id, self.__fetch(video_id))
+        batch.commit()
+
+
+    def __store(self, video_id, v):
+        with metrics.span("db_write"): status = self.__write_video(video_id, v)
+        metrics.count(f"videos_{status}")
+        return status
+
+
+    def __write_video(self, video_id, v):
+        cur = db.cursor()
+        seq = self.__next_seq(cur)
         if not v:
-            cur.execute("INSERT OR IGNORE INTO videos (video_id, availability) VALUES (?,?)", (video_id, "lost"))
-            db.commit()
-            return
+            cur.execute("INSERT OR IGNORE INTO videos (video_id, availability, seq) VALUES (?,?,?)", (video_id, "lost", seq))
+            self.__lost_attempt(cur, video_id)
+            return "lost"
 
-        # Prepare metadata for archival
-        v = self.__refine_metadata(v)
-        msg = "Video successfully archived"
+        msg, status = "Video successfully archived", "archived"
         if v.get("availability") == "recovered":
-            msg = "Video successfully recovered and archived"
+            msg, status = "Video successfully recovered and archived", "recovered"
 
         # Insert user and channel
         cur.execute("INSERT OR IGNORE INTO users VALUES(?,?)", (
@@ -151,51 +447,160 @@ class Archive:
 
         try:
             # Add video
-            cur.execute("INSERT INTO videos VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", (
+            cur.execute("""INSERT INTO videos (video_id, title, description, channel, thumbnail, thumbnail_url,
+                duration, views, age_limit, live_status, likes, dislikes, rating, upload_timestamp, availability,
+                width, height, fps, audio_channels, category, filesize, thumbnail_hash, refreshed, seq)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,strftime('%s','now'),?)""", (
                 v["id"], v["fulltitle"], v["description"], v["channel_id"], v["thumbnail"], v["thumbnail_url"],
                 v["duration"], v["views"], v["age_limit"], v["live_status"], v["likes"], v["dislikes"],
                 v["rating"], v["upload_date"], v["availability"], v["width"], v["height"], v["fps"],
-                v["audio_channels"], v["category"], v["filesize"], None
+                v["audio_channels"], v["category"], v["filesize"], v["thumbnail_hash"], seq
             ))
         except sqlite3.IntegrityError:
-            # Update video info
-            if v["fulltitle"] and v["channel_id"] and v["filesize"] and v["duration"]:
-                cur.execute("""UPDATE videos SET title = ?, description = ?, channel = ?, thumbnail = ?,
+            # Update video info, anything found beats the placeholder of a lost video
+            lost = cur.execute("SELECT 1 FROM videos WHERE video_id == ? AND availability == 'lost'", (v["id"],)).fetchone()
+            if lost or (v["fulltitle"] and v["channel_id"] and v["filesize"] and v["duration"]):
+                # Keep the current thumbnail when there is no new one
+                cur.execute("""UPDATE videos SET title = ?, description = ?, channel = ?,
+                    thumbnail = coalesce(?, CASE WHEN ? IS NULL THEN thumbnail END),
                     thumbnail_url = ?, duration = ?, views = ?, age_limit = ?, live_status = ?, likes = ?,
                     dislikes = ?, rating = ?, upload_timestamp = ?, availability = ?, width = ?, height = ?,
-                    fps = ?, audio_channels = ?, category = ?, filesize = ? WHERE video_id == ?""", (
-                    v["fulltitle"], v["description"], v["channel_id"], v["thumbnail"], v["thumbnail_url"],
+                    fps = ?, audio_channels = ?, category = ?, filesize = ?,
+                    thumbnail_hash = coalesce(?, CASE WHEN ? IS NULL THEN thumbnail_hash END),
+                    refreshed = strftime('%s','now'), seq = ? WHERE video_id == ?""", (
+                    v["fulltitle"], v["description"], v["channel_id"], v["thumbnail"], v["thumbnail_hash"], v["thumbnail_url"],
                     v["duration"], v["views"], v["age_limit"], v["live_status"], v["likes"], v["dislikes"],
                     v["rating"], v["upload_date"], v["availability"], v["width"], v["height"], v["fps"],
-                    v["audio_channels"], v["category"], v["filesize"], v["id"]
+                    v["audio_channels"], v["category"], v["filesize"], v["thumbnail_hash"], v["thumbnail"], seq, v["id"]
                 ))
-                msg = "Video successfully updated"
+                cur.execute("DELETE FROM lost_attempts WHERE video == ?", (v["id"],))
+                msg, status = "Video successfully updated", "updated"
             else:
                 print(utils.color("Video found but cannot be updated.", "red", True))
-                return
-
-        # Add comments
-        for c in v.get("comments") or []:
-            # Check if user is in the database
-            if not cur.execute("SELECT 1 FROM users WHERE user_id == ?", (c["author_id"],)).fetchone():
-                cur.execute("INSERT INTO users VALUES(?,?)", (c["author_id"], c["author"]))
+                return "unchanged"
 
+        # Add comment authors in one go
+        comments, authors = v.get("comments") or [], {}
+        for c in comments:
+            authors.setdefault(c["author_id"], c["author"])
             if c["parent"] == "root": c["parent"] = None
-            cur.execute("INSERT INTO comments VALUES (?,?,?,?,?,?,?,?,?)", (
-                c["id"], v["id"], c["author_id"], c["text"], c["like_count"],
-                c["is_favorited"], c["author_is_uploader"], c["parent"], c["timestamp"]
-            ))
+        cur.executemany("INSERT OR IGNORE INTO users VALUES(?,?)", authors.items())
 
-        # Add video tags
-        for tag in v.get("tags") or []:
-            cur.execute("INSERT OR IGNORE INTO tags VALUES(?)", (tag,))
-            cur.execute("INSERT OR IGNORE INTO video_tags(video, tag) VALUES(?,?)", (video_id, tag))
+        # Add comments
+        cur.executemany("""INSERT OR IGNORE INTO comments (comment_id, video, author, content, likes,
+            is_favorited, author_is_uploader, parent, timestamp, seq) VALUES (?,?,?,?,?,?,?,?,?,?)""", ((
+            c["id"], v["id"], c["author_id"], c["text"], c["like_count"],
+            c["is_favorited"], c["author_is_uploader"], c["parent"], c["timestamp"], seq
+        ) for c in comments))
+        metrics.count("comments_inserted", cur.rowcount)
 
-        # Commit new video
-        db.commit()
+        # Add video tags
+        tags = v.get("tags") or []
+        cur.executemany("INSERT OR IGNORE INTO tags VALUES(?)", ((tag,) for tag in tags))
+        cur.executemany("INSERT OR IGNORE INTO video_tags(video, tag, seq) VALUES(?,?,?)", ((video_id, tag, seq) for tag in tags))
 
         # Print video archival status
         print(utils.color(msg, "green", True))
+        return status
+
+
+    def __next_seq(self, cur):
+        # Everything written for one video shares a number, 'since' exports find new rows by it
+        return cur.execute("UPDATE sequences SET value = value + 1 WHERE name == 'export' RETURNING value").fetchone()["value"]
+
+
+    def __lost_attempt(self, cur, video_id):
+        cur.execute("""INSERT INTO lost_attempts VALUES (?, 1, strftime('%s','now'), ?, strftime('%s','now') + ?)
+            ON CONFLICT(video) DO UPDATE SET attempts = attempts + 1, last_attempt = excluded.last_attempt,
+            last_error = excluded.last_error, next_attempt = excluded.last_attempt + min(?, ? << attempts)""",
+            (video_id, lost_errors.pop(video_id, None), LOST_RECHECK, LOST_RECHECK_MAX, LOST_RECHECK))
+        wayback_misses.save()
+
+
+    def refresh(self, args):
+        try:
+            count = int(args[0]) if args else -1
+            deadline = time.time() + float(args[1])*60 if len(args) > 1 else None
+        except ValueError:
+            raise ValueError("Count and minutes must be numbers")
+
+        # Stalest and most viewed first, length(views) is about log10(views)
+        now = int(time.time())
+        videos = db.execute("""SELECT video_id FROM videos WHERE availability IS NOT 'lost'
+            AND coalesce(refreshed, archived, 0) <= ? AND coalesce(refresh_retry, 0) <= ?
+            ORDER BY (? - coalesce(refreshed, archived, 0)) * length(coalesce(views, 0)) DESC LIMIT ?""",
+            (now - configs["refresh_days"] * 86400, now, now, count)).fetchall()
+        if not videos: return "No videos need refreshing."
+
+        refreshed, failed, in_a_row, time_started = 0, 0, 0, utils.time.perf_counter()
+        for i, (entry, fetch) in enumerate(self.__prefetch(((video["video_id"],) for video in videos), set(), self.__fetch_stats)):
+            if deadline and time.time() >= deadline:
+                print(utils.color("\nOut of time, run the command again to continue", "yellow"))
+                break
+            if i % 100 == 0: utils.step_format(i+1, len(videos), time_started)
+
+            try: stats = fetch()
+            except Throttled as e:
+                print(utils.color(f"\nStill throttled ({e}), run the command again later", "yellow"))
+                break
+            except Exception as e:
+                print(f"{type(e)}, {e}")
+                stats = None
+
+            # Failed videos are tried again later, they aren't refreshed
+            with batch.entry(), metrics.span("db_write"):
+                if stats:
+                    db.execute("""UPDATE videos SET views = coalesce(?, views), likes = coalesce(?, likes),
+                        dislikes = coalesce(?, dislikes), rating = coalesce(?, rating), refreshed = ?, refresh_retry = NULL
+                        WHERE video_id == ?""", (stats["views"], stats["likes"], stats["dislikes"], stats["rating"], int(time.time()), entry[0]))
+                else: db.execute("UPDATE videos SET refresh_retry = ? WHERE video_id == ?", (int(time.time()) + REFRESH_RETRY, entry[0]))
+            if stats: refreshed, in_a_row = refreshed + 1, 0
+            else: failed, in_a_row = failed + 1, in_a_row + 1
+
+            if in_a_row >= REFRESH_FAILURES:
+                print(utils.color(f"\n{in_a_row} videos failed in a row, run the command again later", "yellow"))
+                break
+        batch.commit()
+        metrics.count("videos_refreshed", refreshed)
+
+        time_taken = utils.format_time(utils.time.perf_counter() - time_started)
+        print(utils.color(f"Refreshed {refreshed} video(s) in {time_taken['time']} {time_taken['unit']}, {failed} failed", "green", True))
+
+
+    def __fetch_stats(self, video_id):
+        # Counters only, from RYD or yt-dlp without comments if RYD has nothing
+        ryd = self.__get_ryd(video_id)
+        if ryd: return {"views": ryd.get("viewCount"), "likes": ryd.get("likes"), "dislikes": ryd.get("dislikes"), "rating": ryd.get("rating")}
+
+        with extractors.get({"getcomments": False} | options) as ydlp:
+            try:
+                with metrics.span("extract"): info = self.__extract(ydlp, video_id)
+            except yt_dlp.utils.DownloadError:
+                logging.warning(f"Failed refreshing {video_id}")
+                return None
+        return {"views": info.get("view_count"), "likes": info.get("like_count"), "dislikes": None, "rating": None}
+
+
+    def replay(self, args):
+        # Store videos again from the raw cache without any network calls
+        if args: video_ids = [(args[0],)]
+        else: video_ids = ((row["video_id"],) for row in db.execute("SELECT video_id FROM videos ORDER BY rowid").fetchall())
+
+        replayed, missing, time_started = 0, 0, utils.time.perf_counter()
+        for entry, fetch in self.__prefetch(video_ids, set(), partial(self.__fetch, replay=True)):
+            v = fetch()
+            if not v:
+                missing += 1
+                continue
+            try:
+                with batch.entry(): self.__store(entry[0], v)
+                replayed += 1
+            except sqlite3.IntegrityError as e:
+                logging.error(f"Integrity Error: {e}")
+        batch.commit()
+
+        time_taken = utils.format_time(utils.time.perf_counter() - time_started)
+        print(utils.color(f"Replayed {replayed} video(s) in {time_taken['time']} {time_taken['unit']}, {missing} not cached", "green", True))
 
 
     def dump(self, args):
@@ -205,14 +610,28 @@ class Archive:
             if not os.path.exists("thumbnails"):
                 os.mkdir("thumbnails")
 
-            dumped = 0
-            for video in db.execute("SELECT video_id, thumbnail, thumbnail_url FROM videos").fetchall():
-                if not video["thumbnail"]: continue
-                thumbnail_path = f"thumbnails/{video['video_id']}.{video['thumbnail_url'].split('.')[-1].split('?')[0]}"
-
-                if os.path.exists(thumbnail_path): continue
-                with open(thumbnail_path, "wb") as thumb_file:
-                    thumb_file.write(video["thumbnail"])
+            # Rows are streamed and thumbnails read one by one through incremental
+            # blob I/O, the files are written by a pool while the next ones are read
+            dumped, workers, pending = 0, configs["workers"], deque()
+            with ThreadPoolExecutor(workers) as pool:
+                for video in db.execute("""SELECT rowid, video_id, thumbnail_url, thumbnail_hash FROM videos
+                    WHERE thumbnail_hash IS NOT NULL OR (thumbnail IS NOT NULL AND length(thumbnail) > 0)"""):
+                    thumbnail_path = f"thumbnails/{video['video_id']}.{video['thumbnail_url'].split('.')[-1].split('?')[0]}"
+                    if os.path.exists(thumbnail_path): continue
+
+                    if video["thumbnail_hash"]:
+                        pending.append(pool.submit(shutil.copyfile, thumbnail_store.path(video["thumbnail_hash"]), thumbnail_path))
+                    else:
+                        with db.blobopen("videos", "thumbnail", video["rowid"], readonly=True) as blob:
+                            pending.append(pool.submit(self.__write_file, thumbnail_path, blob.read()))
+
+                    # Bound the number of thumbnails held in memory
+                    while len(pending) > workers*2:
+                        pending.popleft().result()
+                        dumped += 1
+
+                while pending:
+                    pending.popleft().result()
                     dumped += 1
 
             if dumped != 0:
@@ -220,16 +639,70 @@ class Archive:
             else:
                 print(utils.color("There are no thumbnails in the database.", "yellow"))
 
+
+    def __write_file(self, path, data):
+        with open(path, "wb") as file:
+            file.write(data)
+
+
+    def store(self, args):
+        if not args: raise TypeError("Store what ?")
+        if args[0].lower() == "thumbnails":
+            size, scan = self.__database_stats()
+            rowids = [row["rowid"] for row in db.execute(
+                "SELECT rowid FROM videos WHERE thumbnail IS NOT NULL AND length(thumbnail) > 0")]
+            if not rowids:
+                print(utils.color("There are no thumbnails in the database.", "yellow"))
+                return
+
+            # Move every thumbnail blob to the store
+            time_started = utils.time.perf_counter()
+            try:
+                for i, rowid in enumerate(rowids):
+                    if (i+1) % 1000 == 0: utils.step_format(i+1, len(rowids), time_started)
+                    with db.blobopen("videos", "thumbnail", rowid, readonly=True) as blob:
+                        digest = thumbnail_store.put(blob.read())
+                    with batch.entry():
+                        db.execute("UPDATE videos SET thumbnail = NULL, thumbnail_hash = ? WHERE rowid == ?", (digest, rowid))
+            finally: batch.commit()
+
+            logging.info("Reclaiming free space")
+            db.execute("VACUUM")
+            # VACUUM may renumber rowids, the search indexes refer to them
+            db.execute("INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')")
+            db.execute("INSERT INTO comments_fts(comments_fts) VALUES ('rebuild')")
+            db.commit()
+            new_size, new_scan = self.__database_stats()
+            print(utils.color(f"{len(rowids)} thumbnails moved to the thumbnail store", "green", True))
+            print(f"Database size: {utils.format_size(size)} -> {utils.format_size(new_size)}")
+            print(f"Full videos scan: {scan*1000:.1f} ms -> {new_scan*1000:.1f} ms")
+
+
+    def __database_stats(self):
+        size = db.execute("PRAGMA page_count").fetchone()["page_count"] * db.execute("PRAGMA page_size").fetchone()["page_size"]
+        started = utils.time.perf_counter()
+        for video in db.execute("SELECT * FROM videos"): pass
+        return size, utils.time.perf_counter() - started
+
     # https://www.youtube.com/playlist?list=PLJOKxKrh9kD2zNxOC1oYZxcLbwHA7v50J
     def playlist(self, args):
+        self.__read_playlist(args, self.__save_playlist)
+
+
+    def sync(self, args):
+        self.__read_playlist(args, self.__sync_playlist)
+
+
+    def __read_playlist(self, args, save):
+        # Read a playlist and hand it to save() with its fingerprint
         if not args: raise ValueError("What playlist ?")
         args = " ".join(args)
 
         # Check if the arguments are an ID or a filepath
         if args.split(".")[-1] == "csv":
             try:
-                # Get playlist from file
-                with open(args, "rt", newline="") as pl_file:
+                # Stream playlist from file
+                with open(args, "rb") as pl_file:
                     pl_title = Path(args).stem[:-7] # Remove " videos" postfix
 
                     playlist = {
@@ -240,23 +713,20 @@ class Archive:
                         "Title": pl_title,
                         "Description": None,
                         "Visibility": "Local",
-                        "Videos": []
+                        "Videos": (list(video.values()) for video in utils.csv_rows(pl_file))
                     }
-
-                    for video in list(csv.DictReader(pl_file, delimiter=',')):
-                        playlist["Videos"].append(list(video.values()))
+                    save(playlist, utils.fingerprint(pl_file))
 
             except FileNotFoundError:
                 raise FileNotFoundError("Playlist file not found")
             except csv.Error as e:
                 logging.error(f"CSV reader error: {e}")
-                return
         else:
             # Get playlist from yt-dlp
             logging.info("Extracting playlist info")
-            with yt_dlp.YoutubeDL({"quiet":True} | options) as ydlp:
+            with extractors.get({"quiet":True} | options) as ydlp:
                 try:
-                    info = ydlp.extract_info(f"{utils.YOUTUBE}playlist?list={args}", download=False)
+                    info = self.__extract(ydlp, f"{utils.YOUTUBE}playlist?list={args}")
                 except yt_dlp.utils.DownloadError as e: return
 
             for i in range(len(info.get("entries") or [])):
@@ -270,48 +740,114 @@ class Archive:
                 "Title": info.get("title"),
                 "Description": info.get("description"),
                 "Visibility": info.get("availability"),
-                "Videos": info.get("entries")
+                "Videos": info.get("entries") or []
             }
+            ids = " ".join(video[0] for video in playlist["Videos"])
+            save(playlist, hashlib.sha256(ids.encode()).hexdigest())
+
+
+    def __save_playlist(self, playlist, fingerprint):
+        id = playlist["Playlist ID"]
+        job = self.__find_job("playlist", id, fingerprint)
+        if not job:
+            # Parse timestamps into a datetime object
+            if playlist.get("Time Updated"): playlist["Time Updated"] = utils.parse_timestamp(playlist["Time Updated"])
+            if playlist.get("Time Created"): playlist["Time Created"] = utils.parse_timestamp(playlist["Time Created"])
+
+            # Check if the playlist already exists in the database
+            if db.execute("SELECT 1 FROM playlists WHERE playlist_id == ?", (id,)).fetchone():
+                print(f"Playlist already exists, Overwrite it ?", end=" ")
+                if not utils.user_confirm():
+                    print("Aborting ...")
+                    return
+
+            # Overwrite playlist if it already exists
+            db.execute("DELETE FROM playlists WHERE playlist_id == ?", (id,))
+            db.execute("INSERT INTO playlists VALUES(?,?,?,?,?,?,?,NULL)", (id,
+                playlist["Channel ID"], playlist["Time Created"],
+                playlist["Time Updated"], playlist["Title"],
+                playlist["Description"], playlist["Visibility"])
+            )
+
+            # remove spaces from video IDs and parse timestamps
+            job = self.__start_job("playlist", id, fingerprint, ((video[0].replace(" ", ""),
+                utils.parse_timestamp(video[1]) if video[1] else None) for video in playlist["Videos"]))
+
+        time_taken = utils.format_time(self.__run_job(job, partial(self.__store_playlist_video, id)))
+        self.__playlist_synced(id, fingerprint)
+        print(utils.color(f"Finished Archiving playlist <{playlist['Title']}> ({id}), "
+            f"Time taken: {time_taken['time']} {time_taken['unit']}", "green", True))
+
+
+    def __sync_playlist(self, playlist, fingerprint):
+        id = playlist["Playlist ID"]
+        saved = db.execute("SELECT fingerprint FROM playlists WHERE playlist_id == ?", (id,)).fetchone()
+        if saved and saved["fingerprint"] == fingerprint:
+            return print(utils.color(f"Playlist <{playlist['Title']}> ({id}) is unchanged", "green", True))
+
+        job = self.__find_job("sync", id, fingerprint)
+        if not job:
+            if playlist.get("Time Updated"): playlist["Time Updated"] = utils.parse_timestamp(playlist["Time Updated"])
+            if playlist.get("Time Created"): playlist["Time Created"] = utils.parse_timestamp(playlist["Time Created"])
+            db.execute("""INSERT INTO playlists VALUES(?,?,?,?,?,?,?,NULL) ON CONFLICT(playlist_id) DO UPDATE SET
+                channel = excluded.channel, created = coalesce(excluded.created, created), updated = excluded.updated,
+                title = excluded.title, description = excluded.description, visibility = excluded.visibility""", (id,
+                playlist["Channel ID"], playlist["Time Created"], playlist["Time Updated"],
+                playlist["Title"], playlist["Description"], playlist["Visibility"]))
+
+            entries = [(video[0].replace(" ", ""), utils.parse_timestamp(video[1]) if video[1] else None)
+                for video in playlist["Videos"]]
+            job = self.__start_job("sync", id, fingerprint, self.__playlist_delta(id, entries))
+
+        time_taken = utils.format_time(self.__run_job(job, partial(self.__store_synced_video, id)))
+        self.__playlist_synced(id, fingerprint)
+        print(utils.color(f"Finished syncing playlist <{playlist['Title']}> ({id}), "
+            f"Time taken: {time_taken['time']} {time_taken['unit']}", "green", True))
+
+
+    def __playlist_delta(self, playlist_id, entries):
+        # Remove the rows no longer in the playlist and return the entries to insert.
+        # Kept rows stay as they are up to the first difference in order, the rows
+        # after it are inserted again after the kept ones, with their added timestamps.
+        rows = db.execute("SELECT pl, video, added FROM playlist_videos WHERE playlist == ? ORDER BY pl", (playlist_id,)).fetchall()
+        wanted = {}
+        for video_id, added in entries: wanted[video_id] = wanted.get(video_id, 0) + 1
+
+        kept, removed = [], []
+        for row in rows:
+            if wanted.get(row["video"]):
+                wanted[row["video"]] -= 1
+                kept.append(row)
+            else: removed.append(row["pl"])
+
+        same = 0
+        while same < len(kept) and kept[same]["video"] == entries[same][0]: same += 1
+        gone, moved, added = len(removed), kept[same:], {}
+        for row in moved: added.setdefault(row["video"], []).append(row["added"])
+
+        db.executemany("DELETE FROM playlist_videos WHERE pl == ?", ((pl,) for pl in removed + [row["pl"] for row in moved]))
+        delta = [(video_id, added[video_id].pop(0) if added.get(video_id) else timestamp) for video_id, timestamp in entries[same:]]
+        print(f"{len(entries)} videos: {same} unchanged, {len(delta) - len(moved)} added, {gone} removed, {len(moved)} moved")
+        return delta
+
+
+    def __store_synced_video(self, playlist_id, entry, fetch):
+        status = self.__archive_fetched(entry[0], fetch) if fetch else "skipped"
+        db.execute("INSERT INTO playlist_videos(playlist, video, added) VALUES(?,?,?)", (playlist_id, entry[0], entry[1]))
+        return status
+
+
+    def __playlist_synced(self, playlist_id, fingerprint):
+        # Only finished playlists are remembered as in sync
+        db.execute("""UPDATE playlists SET fingerprint = ? WHERE playlist_id == ? AND NOT EXISTS (SELECT 1 FROM jobs
+            WHERE kind IN ('playlist', 'sync') AND source == ? AND status == 'running')""", (fingerprint, playlist_id, playlist_id))
+        db.commit()
 
-        # Parse timestamps into a datetime object
-        if playlist.get("Time Updated"): playlist["Time Updated"] = parse(playlist["Time Updated"]).timestamp()
-        if playlist.get("Time Created"): playlist["Time Created"] = parse(playlist["Time Created"]).timestamp()
-        id, cur = playlist["Playlist ID"], db.cursor()
 
-        # Check if the playlist already exists in the database
-        if cur.execute("SELECT 1 FROM playlists WHERE playlist_id == ?", (id,)).fetchone():
-            print(f"Playlist already exists, Overwrite it ?", end=" ")
-            if not utils.user_confirm():
-                print("Aborting ...")
-                return
-
-        # Overwrite playlist if it already exists
-        cur.execute("DELETE FROM playlists WHERE playlist_id == ?", (id,))
-        cur.execute("INSERT INTO playlists VALUES(?,?,?,?,?,?,?)", (id,
-            playlist["Channel ID"], playlist["Time Created"],
-            playlist["Time Updated"], playlist["Title"],
-            playlist["Description"], playlist["Visibility"])
-        )
-
-        # Save videos
-        time_started = utils.time.perf_counter()
-        for i, video in enumerate(playlist["Videos"]):
-            utils.step_format(i+1, len(playlist["Videos"]), time_started)
-            # Parse timestamp
-            if video[1]: video[1] = parse(video[1]).timestamp()
-
-            # remove spaces from video ID and parse timestamp
-            video = [video[0].replace(" ", ""), video[1]]
-            try:
-                self.video([video[0]], force=False)
-                cur.execute("INSERT INTO playlist_videos(playlist, video, added) VALUES(?,?,?)", (
-                    playlist["Playlist ID"], video[0], video[1]))
-            except sqlite3.IntegrityError as e:
-                logging.error(f"Integrity Error: {e}")
-
-        db.commit()
-        # TODO: print total time taken
-        print(utils.color(f"Finished Archiving playlist <{playlist['Title']}> ({playlist['Playlist ID']})", "green", True))
+    def __store_playlist_video(self, playlist_id, entry, fetch):
+        status = self.__archive_fetched(entry[0], fetch)
+        db.execute("INSERT INTO playlist_videos(playlist, video, added) VALUES(?,?,?)", (playlist_id, entry[0], entry[1]))
+        return status
 
 
     def history(self, args):
@@ -319,53 +855,298 @@ class Archive:
         path = " ".join(args)
 
         try:
-            with open(path, "r", encoding="utf8") as history_file:
-                history = json.load(history_file)
+            with open(path, "rb") as history_file:
+                fingerprint = utils.fingerprint(history_file)
+                job = self.__find_job("history", os.path.abspath(path), fingerprint)
+                if not job: job = self.__plan_history(history_file, fingerprint)
         except FileNotFoundError as e:
             raise FileNotFoundError("History file not found")
         except (json.JSONDecodeError, ValueError) as e:
             print(f"{e}, {type(e)}")
+            return
+
+        if not job: return
+        time_taken = utils.format_time(self.__run_job(job, self.__store_history))
+        print(utils.color(f"Finished Archiving history, Time taken: {time_taken['time']} {time_taken['unit']}", "green", True))
+
 
-        time_started = utils.time.perf_counter()
-        unavailable,cur = 0,db.cursor()
-        for i, video in enumerate(history):
-            utils.step_format(i+1, len(history), time_started)
-            if video.get("titleUrl"):
-                video["titleUrl"] = video.get("titleUrl").split("\u003d")[1]
-            else: unavailable+=1
+    def __plan_history(self, history_file, fingerprint):
+        # Plan the import, only entries missing from the history are kept
+        archived = self.__archived_ids()
+        watched = {(row["video"], row["watched"]) for row in db.execute("SELECT video, watched FROM history")}
+        entries, total, unavailable, skipped = [], 0, 0, 0
+
+        size, time_started = os.fstat(history_file.fileno()).st_size, utils.time.perf_counter()
+        for total, video in enumerate(utils.json_items(history_file), 1):
+            if total % 10000 == 0: utils.step_format(history_file.tell(), size, time_started, size=True)
+            if not video.get("titleUrl"):
+                unavailable += 1
+                continue
 
             try:
-                self.video([video.get("titleUrl")], force=False)
-                data_tuple = (video.get("titleUrl"), parse(video["time"]).timestamp())
-                if not cur.execute("SELECT 1 FROM history WHERE video==? AND watched==?", data_tuple).fetchone():
-                    cur.execute("INSERT INTO history(video, watched) VALUES(?,?)", data_tuple)
-                    db.commit()
-                    print(utils.color("Added to history", "green", True))
-                else: print("Video already in history.")
-            except sqlite3.IntegrityError as e:
-                logging.error(f"Integrity Error: {e}")
+                entry = (video["titleUrl"].split("\u003d")[1], utils.parse_timestamp(video["time"]))
             except Exception as e:
                 print(f"{type(e)}, {e}")
+                continue
 
-        time_taken = utils.format_time(utils.time.perf_counter()-time_started)
-        print(utils.color(f"Finished Archiving history, Time taken: {time_taken['time']} {time_taken['unit']}", "green", True))
-        print(f"{unavailable} unavailable")
+            if entry in watched: skipped += 1
+            else:
+                watched.add(entry)
+                entries.append(entry)
 
+        new_videos = len({video_id for video_id, _ in entries} - archived)
+        print(f"{total} entries: {skipped} already in history or repeated, {unavailable} unavailable, "
+            f"{len(entries)} to add ({new_videos} new videos)")
+
+        if entries: return self.__start_job("history", os.path.abspath(history_file.name), fingerprint, entries)
 
-    def lost(self, args):
-        lost_videos = db.execute("SELECT video_id FROM videos WHERE availability == 'lost'").fetchall()
-        time_started, recovered = utils.time.perf_counter(), 0
 
-        for i, video in enumerate(lost_videos):
-            utils.step_format(i+1, len(lost_videos), time_started)
-            self.video([video.get("video_id")], force=True)
-            if db.execute("SELECT availability FROM videos WHERE video_id == ?", (
-                video.get("video_id"),)).fetchone()["availability"] != "lost": recovered += 1
+    def __store_history(self, entry, fetch):
+        status = self.__archive_fetched(entry[0], fetch)
+        db.execute("INSERT INTO history(video, watched) VALUES(?,?)", (entry[0], entry[1]))
+        print(utils.color("Added to history", "green", True))
+        return status
 
-        time_taken = utils.format_time(utils.time.perf_counter()-time_started)
+
+    def lost(self, args):
+        try:
+            count = int(args[0]) if args else -1
+            deadline = time.time() + float(args[1])*60 if len(args) > 1 else None
+        except ValueError:
+            raise ValueError("Count and minutes must be numbers")
+
+        # Finish an interrupted or time capped run first
+        job = db.execute("SELECT * FROM jobs WHERE kind == 'lost' AND status == 'running' ORDER BY job_id DESC").fetchone()
+        if job:
+            print(f"Resuming lost job {job['job_id']} at entry {job['position']+1}/{job['entries']}")
+            return self.__finish_lost(job, deadline)
+
+        # Only videos due for a re-check, the likeliest to come back first:
+        # those with a Wayback snapshot, then by why they were lost
+        lost_videos = db.execute("""SELECT video_id FROM videos
+            LEFT JOIN lost_attempts ON lost_attempts.video == video_id
+            LEFT JOIN wayback_misses ON wayback_misses.video == video_id
+            WHERE availability == 'lost' AND coalesce(next_attempt, 0) <= ?
+            ORDER BY wayback_misses.video IS NOT NULL, CASE last_error WHEN 'private' THEN 0 WHEN 'unavailable' THEN 1
+            WHEN 'removed' THEN 3 ELSE 2 END, coalesce(attempts, 0), videos.rowid LIMIT ?""", (time.time(), count)).fetchall()
+        total = db.execute("SELECT count(*) AS n FROM videos WHERE availability == 'lost'").fetchone()["n"]
+        if not lost_videos: return f"None of the {total} lost video(s) are due for a re-check."
+        print(f"{len(lost_videos)} of {total} lost video(s) due for a re-check")
+
+        ids = " ".join(video["video_id"] for video in lost_videos)
+        fingerprint = hashlib.sha256(ids.encode()).hexdigest()
+        job = self.__start_job("lost", "lost", fingerprint, ((video["video_id"], None) for video in lost_videos))
+        self.__finish_lost(job, deadline)
+
+
+    def __finish_lost(self, job, deadline=None):
+        time_taken = utils.format_time(self.__run_job(job, self.__store_lost, set(), deadline))
+        recovered = db.execute("""SELECT count(*) AS n FROM job_entries WHERE job == ?
+            AND status IN ('archived', 'recovered', 'updated')""", (job["job_id"],)).fetchone()["n"]
         print(utils.color(f"\nFinished in {time_taken['time']} {time_taken['unit']}, {recovered} video(s) recovered", "green", True))
 
 
+    def __store_lost(self, entry, fetch):
+        return self.__store(entry[0], fetch())
+
+
+    def work(self, args):
+        try: deadline = time.time() + float(args[0])*60 if args else None
+        except ValueError: raise ValueError("Minutes must be a number")
+
+        # Claimed videos are written back one by one so other
+        # workers are never kept waiting on this one's transaction
+        worker, done, failed, time_started = f"{socket.gethostname()}:{os.getpid()}", 0, 0, utils.time.perf_counter()
+        print(f"Worker {worker} started")
+        claimed = set()
+        try:
+            for entry, fetch in self.__prefetch(self.__claim(worker, deadline), claimed):
+                if deadline and time.time() >= deadline: break
+                try:
+                    info = fetch()
+                    with batch.entry():
+                        self.__store(entry[0], info)
+                        db.execute("DELETE FROM queue WHERE video == ?", (entry[0],))
+                    done += 1
+                except Exception as e:
+                    # Retried later, by any worker
+                    print(f"{type(e)}, {e}")
+                    with batch.entry(): db.execute("""UPDATE queue SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                        worker = NULL, lease_expires = ? + attempts * ?, error = ? WHERE video == ? AND worker == ?""",
+                        (QUEUE_ATTEMPTS, time.time(), QUEUE_RETRY, f"{type(e).__name__}: {e}", entry[0], worker))
+                    claimed.discard(entry[0])
+                    failed += 1
+
+                # Still working, extend the leases of the videos held
+                db.execute("UPDATE queue SET lease_expires = ? WHERE worker == ? AND status == 'leased'",
+                    (time.time() + configs["lease_minutes"]*60, worker))
+                batch.commit()
+        finally:
+            # Hand back what wasn't done, a worker killed outright lets its leases expire
+            batch.commit()
+            db.execute("""UPDATE queue SET status = 'pending', worker = NULL, lease_expires = NULL, attempts = attempts - 1
+                WHERE worker == ? AND status == 'leased'""", (worker,))
+            db.commit()
+
+        time_taken = utils.format_time(utils.time.perf_counter() - time_started)
+        print(utils.color(f"Worker {worker} archived {done} video(s) in {time_taken['time']} {time_taken['unit']}, {failed} failed", "green", True))
+
+
+    def __claim(self, worker, deadline):
+        # Lease a few videos at a time, the update is atomic so two workers
+        # never hold the same video. Expired leases and failed videos due for
+        # a retry are handed out again. Without a deadline the worker stops
+        # once nothing can be claimed, otherwise it waits for more
+        size = max(configs["workers"], 1)
+        while not deadline or time.time() < deadline:
+            now = time.time()
+            claimed = db.execute("""UPDATE queue SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE video IN (SELECT video FROM queue WHERE status != 'failed' AND coalesce(lease_expires, 0) < ?
+                ORDER BY added LIMIT ?) RETURNING video""", (worker, now + configs["lease_minutes"]*60, now, size)).fetchall()
+            db.commit()
+
+            if claimed:
+                remaining = db.execute("SELECT count(*) AS n FROM queue WHERE status != 'failed'").fetchone()["n"]
+                print(utils.color(f"\n[{remaining} queued]", "cyan"), " ".join(video["video"] for video in claimed))
+                yield from ((video["video"],) for video in claimed)
+            elif deadline: time.sleep(QUEUE_POLL)
+            else: return
+
+
+    def queue(self, args):
+        if args and args[0].lower() == "retry":
+            retried = db.execute("UPDATE queue SET status = 'pending', attempts = 0, error = NULL WHERE status == 'failed'").rowcount
+            db.commit()
+            return f"{retried} failed video(s) queued again."
+
+        counts = {row["status"]: row["n"] for row in db.execute("SELECT status, count(*) AS n FROM queue GROUP BY status")}
+        if not counts: return "The queue is empty."
+        print(", ".join(f"{status}: {n}" for status, n in sorted(counts.items())))
+        for row in db.execute("""SELECT worker, count(*) AS n, max(lease_expires) AS expires FROM queue
+            WHERE status == 'leased' GROUP BY worker""").fetchall():
+            state = "expired" if row["expires"] < time.time() else "active"
+            print(f"  {row['worker']}: {row['n']} leased ({state})")
+        for row in db.execute("SELECT video, attempts, error FROM queue WHERE status == 'failed' LIMIT 10").fetchall():
+            print(utils.color(f"  {row['video']} failed {row['attempts']} time(s): {row['error']}", "red"))
+
+
+    def stats(self, args):
+        if args and args[0].lower() == "prometheus":
+            path = args[1] if len(args) > 1 else "metrics.prom"
+            with open(path, "w") as metrics_file: metrics_file.write(metrics.prometheus())
+            return f"Metrics written to {path}"
+        if args and args[0].lower() == "reset":
+            metrics.reset()
+            return "Metrics reset."
+
+        stages = metrics.stages()
+        if not stages: return "Nothing archived yet this session."
+        print(f"{'stage':10} {'count':>7} {'total':>9} {'mean':>8} {'p50':>7} {'p99':>7} {'max':>8}")
+        for stage in ("extract", "wayback", "thumbnail", "ryd", "refine", "db_write", "commit"):
+            if not (h := stages.get(stage)): continue
+            print(f"{stage:10} {h['count']:7} {h['sum']:8.2f}s {h['sum']/h['count']:7.3f}s "
+                f"{metrics.percentile(h, 50):6.3f}s {metrics.percentile(h, 99):6.3f}s {h['max']:7.3f}s")
+        print(", ".join(f"{name.replace('_', ' ')}: {value}" for name, value in sorted(metrics.counters().items())))
+
+
+    def resume(self, args):
+        if args: job = db.execute("SELECT * FROM jobs WHERE job_id == ?", (args[0],)).fetchone()
+        else: job = db.execute("SELECT * FROM jobs WHERE status == 'running' ORDER BY job_id DESC").fetchone()
+
+        if not job: raise ValueError("No job to resume")
+        if job["status"] == "finished": raise ValueError(f"Job {job['job_id']} already finished")
+        print(f"Resuming {job['kind']} job {job['job_id']} at entry {job['position']+1}/{job['entries']}")
+
+        if job["kind"] == "lost": return self.__finish_lost(job)
+        if job["kind"] == "history": store = self.__store_history
+        elif job["kind"] == "sync": store = partial(self.__store_synced_video, job["source"])
+        else: store = partial(self.__store_playlist_video, job["source"])
+
+        time_taken = utils.format_time(self.__run_job(job, store))
+        print(utils.color(f"Finished {job['kind']} job {job['job_id']}, Time taken: {time_taken['time']} {time_taken['unit']}", "green", True))
+
+
+    def jobs(self, args):
+        jobs = db.execute("SELECT * FROM jobs ORDER BY job_id DESC LIMIT ?", (int(args[0]) if args else 10,)).fetchall()
+        if not jobs: return "No jobs yet."
+
+        for job in jobs:
+            counts = db.execute("SELECT status, count(*) AS n FROM job_entries WHERE job == ? GROUP BY status", (job["job_id"],))
+            elapsed = utils.format_time(job["elapsed"])
+            rate = job["position"] / job["elapsed"] if job["elapsed"] else 0
+
+            print(f"{utils.color(f'[{job['job_id']}]', 'cyan')} {job['kind']} {job['source']} ({job['status']})")
+            print(f"  {job['position']}/{job['entries']} entries in {elapsed['time']} {elapsed['unit']}, {rate:.2f} entries/sec")
+            print("  " + ", ".join(f"{count['n']} {count['status']}" for count in counts))
+
+
+    def __find_job(self, kind, source, fingerprint):
+        job = db.execute("""SELECT * FROM jobs WHERE kind == ? AND source == ? AND fingerprint == ?
+            AND status == 'running' ORDER BY job_id DESC""", (kind, source, fingerprint)).fetchone()
+        if job: print(f"Resuming {kind} job {job['job_id']} at entry {job['position']+1}/{job['entries']}")
+        return job
+
+
+    def __start_job(self, kind, source, fingerprint, entries):
+        # Journal every entry first so an interrupted run can be resumed
+        try:
+            job = db.execute("INSERT INTO jobs(kind, source, fingerprint) VALUES(?,?,?)", (kind, source, fingerprint)).lastrowid
+            db.executemany("INSERT INTO job_entries(job, position, video, time) VALUES(?,?,?,?)",
+                ((job, position, video, time) for position, (video, time) in enumerate(entries)))
+            db.execute("UPDATE jobs SET entries = (SELECT count(*) FROM job_entries WHERE job == ?) WHERE job_id == ?", (job, job))
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        return db.execute("SELECT * FROM jobs WHERE job_id == ?", (job,)).fetchone()
+
+
+    def __pending_entries(self, job):
+        # Read in pages as entries are updated while iterating
+        position = job["position"]
+        while rows := db.execute("""SELECT video, time, position FROM job_entries WHERE job == ? AND position >= ?
+            ORDER BY position LIMIT 1000""", (job["job_id"], position)).fetchall():
+            yield from ((row["video"], row["time"], row["position"]) for row in rows)
+            position = rows[-1]["position"] + 1
+
+
+    def __journal(self, job, entry, status):
+        db.execute("UPDATE job_entries SET status = ? WHERE job == ? AND position == ?", (status, job["job_id"], entry[2]))
+        db.execute("UPDATE jobs SET position = ? WHERE job_id == ?", (entry[2]+1, job["job_id"]))
+
+
+    def __run_job(self, job, store, archived=None, deadline=None):
+        # Store every pending entry, the entry's status and the job's position
+        # are written in the same transaction so a resumed job continues exactly
+        # after the last committed entry. Stops early once past the deadline.
+        # Returns the time taken.
+        remaining, time_started = job["entries"] - job["position"], utils.time.perf_counter()
+        try:
+            queue = configs["queue"] and job["kind"] != "lost"
+            for i, (entry, fetch) in enumerate(self.__prefetch(self.__pending_entries(job), archived, queue=queue)):
+                if deadline and time.time() >= deadline:
+                    print(utils.color("\nOut of time, run the command again to continue", "yellow"))
+                    break
+                utils.step_format(i+1, remaining, time_started)
+                try:
+                    with batch.entry():
+                        self.__journal(job, entry, store(entry, fetch))
+                    continue
+                except sqlite3.IntegrityError as e:
+                    logging.error(f"Integrity Error: {e}")
+                except Exception as e:
+                    print(f"{type(e)}, {e}")
+
+                with batch.entry(): self.__journal(job, entry, "failed")
+        finally:
+            elapsed = utils.time.perf_counter() - time_started
+            db.execute("UPDATE jobs SET elapsed = elapsed + ? WHERE job_id == ?", (elapsed, job["job_id"]))
+            db.execute("""UPDATE jobs SET status = 'finished', finished = strftime('%s','now')
+                WHERE job_id == ? AND position == entries""", (job["job_id"],))
+            batch.commit()
+        return elapsed
+
+
 
 # https://www.youtube.com/watch?v=gbRe9zGFh6k
 class Unarchive:
@@ -1,9 +1,16 @@
-import json
+import json, logging
 from utils import color, YtLogger
 
 
 
-DEFAULT_CONFIGS = {"thumbnails": True, "comments": True}
+DEFAULT_CONFIGS = {
+    "thumbnails": True, "comments": True, "workers": 1,
+    "connections": 4, "timeout": 5, "retries": 3, "rate": 5,
+    "commit_every": 50, "commit_interval": 10,
+    "thumbnail_store": False, "wayback_recheck_days": 30,
+    "raw_cache": False, "raw_cache_days": 30, "refresh_days": 7,
+    "queue": False, "lease_minutes": 30
+}
 options = {
     "quiet": True,
     "logger": YtLogger(),
@@ -11,26 +18,22 @@ options = {
 }
 
 
-# Read configuration or write defaults
-with open("configs.json", "a+") as config_file:
-    try:
-        config_file.seek(0)
-        configs = json.loads(config_file.read())
-        if configs.keys() != DEFAULT_CONFIGS.keys():
-            raise ValueError("Invalid keys")
-
-        for key in DEFAULT_CONFIGS:
-            if not isinstance(configs[key], type(DEFAULT_CONFIGS[key])):
-                raise ValueError(f"Invalid value datatype for {key}")
-    except (json.JSONDecodeError, ValueError) as e:
-        logging.error(f"{e}, resetting configs.")
-        configs = None
+# Read configuration, options missing from the file use their defaults.
+# The file is only written when a configuration is changed
+configs = dict(DEFAULT_CONFIGS)
+try:
+    with open("configs.json", "r") as config_file:
+        saved = json.loads(config_file.read())
+    if not saved.keys() <= DEFAULT_CONFIGS.keys():
+        raise ValueError("Invalid keys")
 
-    if not configs:
-        configs = DEFAULT_CONFIGS
-        config_file.seek(0)
-        config_file.truncate()
-        config_file.write(json.dumps(DEFAULT_CONFIGS))
+    for key in saved:
+        if not isinstance(saved[key], type(DEFAULT_CONFIGS[key])):
+            raise ValueError(f"Invalid value datatype for {key}")
+    configs |= saved
+except FileNotFoundError: pass
+except (json.JSONDecodeError, ValueError) as e:
+    logging.error(f"{e}, using default configs.")
 
 
 class Config:
@@ -44,6 +47,32 @@ class Config:
       This method takes in the thing to
       change and its state. This will
       probably be changed in the future.
+      With 'thumbnail_store' thumbnails are kept
+      in the thumbnail_store folder instead of
+      the database. With 'raw_cache' raw video
+      data is cached in the raw_cache folder for
+      'raw_cache_days' and can be replayed.
+      With 'queue' bulk archival only queues
+      videos for 'archive work' processes.
+
+    set: config set [option] [number]
+      Set a numeric option. 'workers' is the
+      number of videos fetched in parallel by
+      bulk archival (history and playlists).
+      'connections' limits open connections per
+      host, 'timeout' (seconds) and 'retries'
+      apply to thumbnail and rating requests.
+      'rate' is the most requests per second sent
+      to a single host, it is lowered on its own
+      while a host is throttling us.
+      Bulk runs commit every 'commit_every'
+      videos or 'commit_interval' seconds.
+      Videos without a Wayback snapshot aren't
+      looked up again for 'wayback_recheck_days'.
+      'archive refresh' updates the counters of
+      videos older than 'refresh_days'.
+      Queue workers hold videos for 'lease_minutes'.
+      These options take effect on restart.
     """
     def help(self, args): return self.__doc__
     
@@ -56,7 +85,7 @@ class Config:
         if not args: raise ValueError("Get what ?")
         if len(args) < 2: raise ValueError("True or False ?")
 
-        if args[0] not in configs:
+        if args[0] not in configs or type(configs[args[0]]) != bool:
             raise ValueError(f"Configuration {args[0]} does not exist")
 
         args[1] = args[1].lower()
@@ -70,3 +99,22 @@ class Config:
             config_file.write(json.dumps(configs))
 
         print(f"Get {args[0]} set to <False>")
+
+    def set(self, args):
+        if not args: raise ValueError("Set what ?")
+        if len(args) < 2: raise ValueError("To what ?")
+
+        if args[0] not in configs or type(configs[args[0]]) != int:
+            raise ValueError(f"Numeric configuration {args[0]} does not exist")
+
+        try:
+            value = int(args[1])
+            if value < (0 if args[0] == "retries" else 1): raise ValueError
+        except ValueError:
+            raise ValueError("Value must be a positive number")
+
+        configs[args[0]] = value
+        with open("configs.json", "w") as config_file:
+            config_file.write(json.dumps(configs))
+
+        print(f"{args[0]} set to <{value}>")
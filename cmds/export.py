@@ -0,0 +1,185 @@
+import os, csv, json, gzip, base64, time
+import utils
+from database import db
+
+CHUNK_SIZE = 5000
+# Exported tables: source table and the column new rows are found by in
+# 'since' exports, tables without one are small and always exported in full.
+# The column must only ever grow, history is never deleted from
+TABLES = {
+    "videos": ("videos", "seq"), "channels": ("channels", None),
+    "comments": ("comments", "seq"), "history": ("history", "history_id"),
+    "playlists": ("playlists", None), "playlist_videos": ("playlist_videos", None),
+    "tags": ("video_tags", "seq")
+}
+OPTIONS = ("since", "blobs", "gzip")
+
+
+class Export:
+    """Export command:
+
+    Export the archive for analysis, rows are streamed
+    so any size of archive can be exported. Every table
+    is written to [folder]/[table].[format], the folder
+    defaults to 'export'. Options can be added in any order:
+      [table ...]  Only export these tables (videos, channels,
+                   comments, history, playlists, playlist_videos
+                   and tags), all of them by default.
+      since        Only export what was added since the last
+                   export to this folder, and videos archived
+                   or refreshed since. Files are named
+                   [table]-[date].[format].
+      blobs        Include thumbnails, base64 in text formats.
+      gzip         Compress NDJSON and CSV files.
+
+    ndjson: export ndjson [folder] [options]
+      One JSON object per line.
+      Eg.: export ndjson analytics since videos comments
+
+    csv: export csv [folder] [options]
+      CSV files with a header.
+
+    parquet: export parquet [folder] [options]
+      Zstandard compressed Parquet files, needs pyarrow.
+    """
+    def help(self, args): return self.__doc__
+    def default(self): return self.__doc__
+
+    def ndjson(self, args): return self.__export("ndjson", args)
+    def csv(self, args): return self.__export("csv", args)
+    def parquet(self, args): return self.__export("parquet", args)
+
+
+    def __parse(self, args):
+        folder, tables, options = None, [], set()
+        for arg in args:
+            if arg.lower() in TABLES: tables.append(arg.lower())
+            elif arg.lower() in OPTIONS: options.add(arg.lower())
+            elif folder is None: folder = arg
+            else: raise ValueError(f"Unknown table or option: {arg}")
+        return folder or "export", tables or list(TABLES), options
+
+
+    def __columns(self, table, blobs):
+        # Declared column types, BLOBs are left out unless asked for
+        columns = db.execute(f"PRAGMA table_info({table})").fetchall()
+        return [(column["name"], column["type"].upper()) for column in columns if blobs or column["type"].upper() != "BLOB"]
+
+
+    def __stored_types(self, table, columns, where, params):
+        # INTEGER columns can hold REAL values, like Takeout timestamps with
+        # their milliseconds, those are exported as REAL to keep them whole
+        integers = [column for column, type in columns if type == "INTEGER"]
+        if not integers: return columns
+        reals = db.execute(f"""SELECT {', '.join(f"max(typeof({column}) == 'real') AS {column}" for column in integers)}
+            FROM {table}{where}""", params).fetchone()
+        return [(column, "REAL" if reals.get(column) else type) for column, type in columns]
+
+
+    def __export(self, format, args):
+        folder, tables, options = self.__parse(args)
+        since = "since" in options
+        if format == "parquet":
+            try: import pyarrow, pyarrow.parquet
+            except ImportError: raise ImportError("Parquet exports need pyarrow (pip install pyarrow)")
+        os.makedirs(folder, exist_ok=True)
+
+        state_path = os.path.join(folder, "export.json")
+        try:
+            with open(state_path, "r") as state_file: state = json.load(state_file)
+        except FileNotFoundError: state = {}
+        if since and not state: print(utils.color("No previous export in this folder, exporting everything", "yellow"))
+        last = state if since else {}
+
+        extension = format + (".gz" if "gzip" in options and format != "parquet" else "")
+        suffix = stamp = f"-{time.strftime('%Y%m%dT%H%M%S')}" if since else ""
+        # Runs within the same second don't overwrite each other
+        for n in range(1, 1000):
+            if not since or not any(os.path.exists(os.path.join(folder, f"{name}{suffix}.{extension}")) for name in tables): break
+            suffix = f"{stamp}-{n}"
+        started, exported = time.perf_counter(), {}
+
+        # Read everything from one snapshot so the marks match the rows exported
+        db.commit()
+        db.execute("BEGIN")
+        try:
+            marks = {"videos_time": int(time.time())} if "videos" in tables else {}
+            for name in tables:
+                table, key = TABLES[name]
+                if key: marks[name] = db.execute(f"SELECT coalesce(max({key}), 0) AS top FROM {table}").fetchone()["top"]
+
+            for name in tables:
+                table, key = TABLES[name]
+                columns = self.__columns(table, "blobs" in options)
+                where, params = "", {}
+                if key:
+                    where = f"{key} > :last AND {key} <= :top"
+                    # Archived or refreshed videos are exported again
+                    if name == "videos": where = f"({where}) OR (coalesce(refreshed, archived, 0) > :time AND seq <= :top)"
+                    where = f" WHERE {where}"
+                    params = {"last": last.get(name, 0), "top": marks[name], "time": last.get("videos_time", 0)}
+                if format == "parquet": columns = self.__stored_types(table, columns, where, params)
+                query = f"SELECT {', '.join(column for column, type in columns)} FROM {table}{where}"
+
+                path = os.path.join(folder, f"{name}{suffix}.{extension}")
+                exported[name] = self.__write(format, path, columns, self.__rows(query, params), "gzip" in options)
+                print(f"{name}: {exported[name]} rows")
+        finally:
+            db.rollback()
+
+        # Only move the marks on once every table was written
+        with open(state_path, "w") as state_file: json.dump(state | marks, state_file)
+
+        time_taken = utils.format_time(time.perf_counter() - started)
+        return utils.color(f"Exported {sum(exported.values())} rows to {folder} in {time_taken['time']} {time_taken['unit']}", "green", True)
+
+
+    def __rows(self, query, params):
+        # Plain tuples in chunks, memory doesn't grow with the table
+        cursor = db.cursor()
+        cursor.row_factory = None
+        cursor.execute(query, params)
+        while chunk := cursor.fetchmany(CHUNK_SIZE):
+            yield chunk
+
+
+    def __write(self, format, path, columns, chunks, compress):
+        with utils.atomic_path(path) as temporary:
+            if format == "parquet": return self.__write_parquet(temporary, columns, chunks)
+            with (gzip.open if compress else open)(temporary, "wt", newline="", encoding="utf-8") as file:
+                return (self.__write_ndjson if format == "ndjson" else self.__write_csv)(file, columns, chunks)
+
+
+    def __text(self, value):
+        return base64.b64encode(value).decode() if isinstance(value, bytes) else value
+
+
+    def __write_ndjson(self, file, columns, chunks):
+        names, count = [column for column, type in columns], 0
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        for chunk in chunks:
+            file.writelines(encode(dict(zip(names, map(self.__text, row)))) + "\n" for row in chunk)
+            count += len(chunk)
+        return count
+
+
+    def __write_csv(self, file, columns, chunks):
+        writer, count = csv.writer(file), 0
+        writer.writerow(column for column, type in columns)
+        for chunk in chunks:
+            writer.writerows(map(self.__text, row) for row in chunk)
+            count += len(chunk)
+        return count
+
+
+    def __write_parquet(self, path, columns, chunks):
+        import pyarrow, pyarrow.parquet
+        types = {"INTEGER": pyarrow.int64(), "REAL": pyarrow.float64(), "BLOB": pyarrow.binary()}
+        schema = pyarrow.schema([(column, types.get(type, pyarrow.string())) for column, type in columns])
+
+        count = 0
+        with pyarrow.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+            for chunk in chunks:
+                writer.write_batch(pyarrow.record_batch([pyarrow.array(values, field.type) for values, field in zip(zip(*chunk), schema)], schema=schema))
+                count += len(chunk)
+        return count
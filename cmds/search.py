@@ -0,0 +1,113 @@
+import sqlite3, time
+import utils
+from database import db
+
+PAGE_SIZE = 10
+# Highlighting of the matched terms in snippets
+MATCH, END = "\033[1m\033[33m", "\033[0m"
+
+
+class Search:
+    """Search command:
+
+    Full-text search over the archive, best matches first.
+    Queries use the FTS5 syntax: words, "exact phrases",
+    prefix*, OR, NOT and NEAR(a b). Results can be narrowed
+    with channel:[id or name], after:[date], before:[date]
+    and paged with page:[number].
+
+    videos: search videos [query]
+      Search video titles and descriptions,
+      matches in titles rank higher.
+      Eg.: search videos lofi hip hop after:2020-01-01
+
+    comments: search comments [query]
+      Search comments, dates filter when
+      the comment was posted.
+
+    rebuild: search rebuild
+      Rebuild the search indexes from the archive.
+      They are kept up to date on their own, this
+      is only needed if they were damaged.
+    """
+    def help(self, args): return self.__doc__
+    def default(self): return self.__doc__
+
+    def __parse(self, args):
+        # Split the filters from the words of the query
+        words, filters, page = [], [], 1
+        for arg in args:
+            key, _, value = arg.partition(":")
+            if key.lower() == "channel" and value:
+                filters.append(("(videos.channel == ? OR channels.name == ? COLLATE NOCASE)", (value, value)))
+            elif key.lower() in ("after", "before") and value:
+                try: timestamp = int(utils.parse_timestamp(value))
+                except (ValueError, OverflowError): raise ValueError(f"Invalid date: {value}")
+                filters.append((f"{{date}} {'>=' if key.lower() == 'after' else '<'} ?", (timestamp,)))
+            elif key.lower() == "page" and value.isdigit() and int(value) > 0: page = int(value)
+            else: words.append(arg)
+
+        if not words: raise ValueError("Search what ?")
+        return " ".join(words), filters, page
+
+
+    def __query(self, columns, tables, order, query, filters, page, date):
+        # One page of results and the number of matches
+        where = "".join(f" AND {condition.format(date=date)}" for condition, params in filters)
+        params = [param for condition, params in filters for param in params]
+        try:
+            results = db.execute(f"SELECT {columns} FROM {tables}{where} ORDER BY {order} LIMIT ? OFFSET ?",
+                (MATCH, END, query, *params, PAGE_SIZE, (page-1) * PAGE_SIZE)).fetchall()
+            total = db.execute(f"SELECT count(*) AS n FROM {tables}{where}", (query, *params)).fetchone()["n"]
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search: {e}")
+        return results, total
+
+
+    def __footer(self, results, total, page):
+        if not results: return "No results." if page == 1 else f"No results on page {page}."
+        first = (page-1) * PAGE_SIZE + 1
+        return f"Results {first}-{first + len(results) - 1} of {total}, page {page}"
+
+
+    def videos(self, args):
+        query, filters, page = self.__parse(args)
+        results, total = self.__query("""video_id, videos.title, channels.name AS channel, upload_timestamp,
+            snippet(videos_fts, 1, ?, ?, '...', 16) AS snippet""", """videos_fts
+            JOIN videos ON videos.rowid == videos_fts.rowid
+            LEFT JOIN channels ON channels.channel_id == videos.channel
+            WHERE videos_fts MATCH ?""", "bm25(videos_fts, 10.0, 1.0)", query, filters, page, "upload_timestamp")
+
+        for video in results:
+            date = time.strftime("%Y-%m-%d", time.gmtime(video["upload_timestamp"])) if video["upload_timestamp"] else "?"
+            print(f"{utils.color(video['video_id'], 'cyan')} {video['title']}")
+            print(f"  {video['channel'] or 'Unknown channel'}, {date}")
+            if video["snippet"]: print(f"  {video['snippet']}".replace("\n", " "))
+        return self.__footer(results, total, page)
+
+
+    def comments(self, args):
+        query, filters, page = self.__parse(args)
+        results, total = self.__query("""comments.video, videos.title, users.username, comments.timestamp,
+            snippet(comments_fts, 0, ?, ?, '...', 24) AS snippet""", """comments_fts
+            JOIN comments ON comments.rowid == comments_fts.rowid
+            JOIN videos ON videos.video_id == comments.video
+            LEFT JOIN channels ON channels.channel_id == videos.channel
+            LEFT JOIN users ON users.user_id == comments.author
+            WHERE comments_fts MATCH ?""", "rank", query, filters, page, "comments.timestamp")
+
+        for comment in results:
+            date = time.strftime("%Y-%m-%d", time.gmtime(comment["timestamp"])) if comment["timestamp"] else "?"
+            print(f"{utils.color(comment['video'], 'cyan')} {comment['title']}")
+            print(f"  {comment['username']}, {date}: {comment['snippet']}".replace("\n", " "))
+        return self.__footer(results, total, page)
+
+
+    def rebuild(self, args):
+        started = time.perf_counter()
+        db.execute("INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')")
+        db.execute("INSERT INTO comments_fts(comments_fts) VALUES ('rebuild')")
+        db.commit()
+        time_taken = utils.format_time(time.perf_counter() - started)
+        return utils.color(f"Search indexes rebuilt in {time_taken['time']} {time_taken['unit']}", "green", True)
+
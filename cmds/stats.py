@@ -0,0 +1,141 @@
+import re, time
+import utils
+from database import db
+
+# Recounted from the history, the same as what the
+# triggers in migrations/010_watch_stats.sql keep up to date
+SUMMARIES = {
+    "watch_days": """SELECT date(watched, 'unixepoch') AS day, coalesce(category, '') AS category, count(*) AS watches,
+        sum(coalesce(duration, 0)) AS duration FROM history LEFT JOIN videos ON video_id == history.video GROUP BY 1, 2""",
+    "watch_channels": """SELECT coalesce(channel, '') AS channel, strftime('%Y-%m', watched, 'unixepoch') AS month, count(*) AS watches,
+        sum(coalesce(duration, 0)) AS duration FROM history LEFT JOIN videos ON video_id == history.video GROUP BY 1, 2"""
+}
+PERIOD = re.compile(r"\d{4}(-\d{2}(-\d{2})?)?")
+CHANNEL_NAME = "coalesce(channels.name, nullif(channel, ''))"
+
+
+class Stats:
+    """Stats command:
+
+    Statistics of your watch history, watch time counts
+    whole videos. To show an overview just type 'stats'.
+    Methods can be narrowed to a period ([year],
+    [year-month] or [year-month-day]), channel:[id or name]
+    or category:[name], top:[number] sets how many rows
+    are shown. Channels are counted per month.
+
+    channels: stats channels [filters]
+      Most watched channels.
+      Eg.: stats channels 2023 top:20
+
+    categories: stats categories [filters]
+      Most watched categories.
+
+    months: stats months [filters]
+      Watches and watch time per month.
+      Eg.: stats months channel:UCsXVk37bltHxD1rDPwtNM8Q
+
+    days: stats days [filters]
+      Watches and watch time per day.
+
+    rebuild: stats rebuild
+      Recount the statistics from the history.
+      They are kept up to date on their own, this
+      is only needed if they were damaged.
+
+    check: stats check
+      Compare the statistics with the history.
+    """
+    def help(self, args): return self.__doc__
+
+    def default(self):
+        total = db.execute("""SELECT sum(watches) AS watches, sum(duration) AS duration, min(day) AS first,
+            max(day) AS last, count(DISTINCT day) AS days FROM watch_days""").fetchone()
+        if not total["watches"]: return "No watches yet."
+
+        print(utils.color(f"{total['watches']} watches, {total['duration'] / 3600:.1f} hours over {total['days']} days "
+            f"({total['first']} to {total['last']})", "cyan"))
+        print(utils.color("\nChannels", "green", True))
+        self.__top("watch_channels", "channel", CHANNEL_NAME, "", [], 5)
+        print(utils.color("\nCategories", "green", True))
+        self.__top("watch_days", "category", "nullif(category, '')", "", [], 5)
+
+
+    def __parse(self, args, table):
+        # Filters as a WHERE clause on one of the summary tables
+        conditions, params, top = [], [], 10
+        period = "day" if table == "watch_days" else "month"
+        for arg in args:
+            key, _, value = arg.partition(":")
+            if PERIOD.fullmatch(arg):
+                if period == "month" and len(arg) > 7: raise ValueError("Channels are counted per month")
+                conditions.append(f"{period} >= ? AND {period} < ?")
+                params += [arg, arg + "~"]
+            elif key.lower() == "channel" and value:
+                if table != "watch_channels": raise ValueError("Channels can't be combined with days or categories")
+                conditions.append("(channel == ? OR channel IN (SELECT channel_id FROM channels WHERE name == ? COLLATE NOCASE))")
+                params += [value, value]
+            elif key.lower() == "category" and value:
+                if table != "watch_days": raise ValueError("Categories can't be combined with channels")
+                conditions.append("category == ? COLLATE NOCASE")
+                params.append(value)
+            elif key.lower() == "top" and value.isdigit(): top = int(value)
+            else: raise ValueError(f"Invalid filter: {arg}")
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params, top
+
+
+    def __format(self, watches, duration):
+        return f"{watches:8} watches {duration / 3600:10.1f} h"
+
+
+    def __top(self, table, column, name, where, params, top):
+        joins = " LEFT JOIN channels ON channel_id == channel" if column == "channel" else ""
+        rows = db.execute(f"""SELECT {name} AS name, sum(watches) AS watches, sum(duration) AS duration
+            FROM {table}{joins}{where} GROUP BY {column} ORDER BY 3 DESC, 2 DESC LIMIT ?""", (*params, top)).fetchall()
+        for row in rows:
+            print(f"{(row['name'] or 'Not archived')[:40]:40} {self.__format(row['watches'], row['duration'])}")
+        return rows
+
+
+    def channels(self, args):
+        if not self.__top("watch_channels", "channel", CHANNEL_NAME, *self.__parse(args, "watch_channels")): return "No watches yet."
+
+
+    def categories(self, args):
+        if not self.__top("watch_days", "category", "nullif(category, '')", *self.__parse(args, "watch_days")): return "No watches yet."
+
+
+    def __periods(self, table, length, args):
+        where, params, top = self.__parse(args, table)
+        period = "day" if table == "watch_days" else "month"
+        rows = db.execute(f"""SELECT substr({period}, 1, {length}) AS period, sum(watches) AS watches, sum(duration) AS duration
+            FROM {table}{where} GROUP BY 1 ORDER BY 1 DESC LIMIT ?""", (*params, top)).fetchall()
+        if not rows: return "No watches yet."
+        for row in rows:
+            print(f"{row['period']:10} {self.__format(row['watches'], row['duration'])}")
+
+
+    def months(self, args):
+        by_channel = any(arg.lower().startswith("channel:") for arg in args)
+        return self.__periods("watch_channels" if by_channel else "watch_days", 7, args)
+
+    def days(self, args): return self.__periods("watch_days", 10, args)
+
+
+    def rebuild(self, args):
+        started = time.perf_counter()
+        for table, summary in SUMMARIES.items():
+            db.execute(f"DELETE FROM {table}")
+            db.execute(f"INSERT INTO {table} {summary}")
+        db.commit()
+        time_taken = utils.format_time(time.perf_counter() - started)
+        return utils.color(f"Statistics rebuilt in {time_taken['time']} {time_taken['unit']}", "green", True)
+
+
+    def check(self, args):
+        differences = 0
+        for table, summary in SUMMARIES.items():
+            differences += db.execute(f"""SELECT (SELECT count(*) FROM (SELECT * FROM {table} EXCEPT {summary}))
+                + (SELECT count(*) FROM ({summary} EXCEPT SELECT * FROM {table})) AS n""").fetchone()["n"]
+        if differences: return utils.color(f"{differences} rows differ from the history, run 'stats rebuild'", "yellow")
+        return utils.color("Statistics match the history.", "green", True)
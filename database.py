@@ -0,0 +1,88 @@
+import sqlite3, logging, os, re
+
+
+def dict_factory(cursor, row):
+    columns = [col[0] for col in cursor.description]
+    return {key: value for key, value in zip(columns, row)}
+
+
+SCHEMA = "schema.sql"
+
+# schema.sql is version 1, later changes live in migrations/<version>_<name>.sql
+def migrations(folder="migrations"):
+    found = [(1, SCHEMA)]
+    for name in os.listdir(folder) if os.path.isdir(folder) else []:
+        if match := re.fullmatch(r"(\d+)_\w+\.sql", name):
+            found.append((int(match.group(1)), os.path.join(folder, name)))
+    return sorted(found)
+
+
+# Statements of a script one at a time, triggers hold semicolons of their own
+def statements(script):
+    statement = ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \t\r\n;"): yield statement
+            statement = ""
+
+
+def migrate(db, folder="migrations"):
+    version = db.execute("PRAGMA user_version").fetchone()["user_version"]
+    pending = []
+    for number, path in migrations(folder):
+        if number <= version: continue
+        with open(path, "r") as migration:
+            pending.append((number, migration.read()))
+    if not pending: return
+
+    # Other processes may be migrating as well, the version is read again once
+    # the write lock is held and what they applied meanwhile is skipped.
+    # Migrations and the version bumps are applied atomically
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        version = db.execute("PRAGMA user_version").fetchone()["user_version"]
+        for number, script in pending:
+            if number <= version: continue
+            logging.info(f"Migrating database to version {number}")
+            for statement in statements(script): db.execute(statement)
+            db.execute(f"PRAGMA user_version = {number}")
+        db.commit()
+    except sqlite3.Error:
+        if db.in_transaction: db.rollback()
+        raise
+
+
+def connect(path):
+    # Checked first, connecting would leave an empty database behind
+    if not os.path.exists(SCHEMA): raise FileNotFoundError(f"Database schema not found ({SCHEMA}), run yark from its folder")
+
+    # Waits on other yark processes writing, like queue workers
+    db = sqlite3.connect(path, timeout=30)
+    db.row_factory = dict_factory
+    db.execute("PRAGMA foreign_keys = ON")
+    migrate(db)
+    return db
+
+
+class LazyConnection:
+    """Connection opened and migrated on first use.
+
+    Stands in for the sqlite3 connection so modules can refer to it
+    at import time without opening the database.
+    """
+    def __init__(self, path):
+        self.path, self.__connection = path, None
+
+    def __getattr__(self, name):
+        if self.__connection is None: self.__connection = connect(self.path)
+        return getattr(self.__connection, name)
+
+    def close(self):
+        # Opened again on next use
+        if self.__connection is not None: self.__connection.close()
+        self.__connection = None
+
+
+# The archive, shared by every command
+db = LazyConnection("youtube.db")
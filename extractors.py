@@ -0,0 +1,38 @@
+import threading, yt_dlp
+from contextlib import contextmanager
+
+
+class ExtractorPool:
+    """Long-lived YoutubeDL instances keyed by their option set.
+
+    Building a YoutubeDL loads the extractor registry, cookie jar and
+    HTTP handlers, so instances are kept and reused instead. They are
+    not thread safe, each one is lent to a single thread at a time.
+    """
+    def __init__(self):
+        self.__idle, self.__extractors = {}, []
+        self.__lock = threading.Lock()
+
+    def __key(self, options):
+        return tuple(sorted((key, repr(value)) for key, value in options.items()))
+
+    @contextmanager
+    def get(self, options):
+        key = self.__key(options)
+        with self.__lock:
+            idle = self.__idle.setdefault(key, [])
+            ydlp = idle.pop() if idle else None
+
+        if not ydlp:
+            ydlp = yt_dlp.YoutubeDL(options)
+            with self.__lock: self.__extractors.append(ydlp)
+
+        try: yield ydlp
+        finally:
+            with self.__lock: self.__idle.setdefault(key, []).append(ydlp)
+
+    def close(self):
+        with self.__lock:
+            for ydlp in self.__extractors: ydlp.close()
+            self.__extractors.clear()
+            self.__idle.clear()
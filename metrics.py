@@ -0,0 +1,71 @@
+import threading, time
+from contextlib import contextmanager
+
+
+class Metrics:
+    """Stage timings and counters of the running session.
+
+    Every span is recorded in a per-stage histogram (seconds, with the
+    same buckets for every stage) so a slow run shows where its time
+    went, counters keep totals like videos archived or bytes downloaded.
+    Both are safe to update from worker threads.
+    """
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self):
+        self.__stages, self.__counters = {}, {}
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try: yield
+        finally: self.observe(stage, time.perf_counter() - started)
+
+    def observe(self, stage, seconds):
+        with self.__lock:
+            histogram = self.__stages.setdefault(stage, {"buckets": [0] * (len(self.BUCKETS)+1), "count": 0, "sum": 0, "max": 0})
+            histogram["buckets"][next((i for i, bound in enumerate(self.BUCKETS) if seconds <= bound), -1)] += 1
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            histogram["max"] = max(histogram["max"], seconds)
+
+    def count(self, name, value=1):
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def stages(self):
+        with self.__lock:
+            return {stage: dict(histogram, buckets=list(histogram["buckets"])) for stage, histogram in self.__stages.items()}
+
+    def counters(self):
+        with self.__lock:
+            return dict(self.__counters)
+
+    def percentile(self, histogram, p):
+        # Upper bound of the bucket the percentile falls in, never above the max
+        seen, target = 0, histogram["count"] * p / 100
+        for bound, count in zip(self.BUCKETS, histogram["buckets"]):
+            seen += count
+            if seen >= target: return min(bound, histogram["max"])
+        return histogram["max"]
+
+    def prometheus(self, prefix="yark"):
+        lines = [f"# HELP {prefix}_stage_seconds Time spent in each archive stage",
+            f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, histogram in sorted(self.stages().items()):
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + ("+Inf",), histogram["buckets"]):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+
+        for name, value in sorted(self.counters().items()):
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.__lock:
+            self.__stages.clear()
+            self.__counters.clear()
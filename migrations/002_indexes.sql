@@ -0,0 +1,16 @@
+-- Remove duplicate tags so they can be made unique
+DELETE FROM video_tags WHERE id NOT IN (SELECT min(id) FROM video_tags GROUP BY video, tag);
+CREATE UNIQUE INDEX IF NOT EXISTS video_tags_video_tag ON video_tags(video, tag);
+CREATE INDEX IF NOT EXISTS video_tags_tag ON video_tags(tag);
+
+-- History lookups during imports
+CREATE INDEX IF NOT EXISTS history_video_watched ON history(video, watched);
+
+-- ON DELETE CASCADE / RESTRICT lookups
+CREATE INDEX IF NOT EXISTS comments_video ON comments(video);
+CREATE INDEX IF NOT EXISTS comments_parent ON comments(parent);
+CREATE INDEX IF NOT EXISTS videos_channel ON videos(channel);
+CREATE INDEX IF NOT EXISTS playlist_videos_playlist ON playlist_videos(playlist);
+
+-- Lost video re-attempts
+CREATE INDEX IF NOT EXISTS videos_availability ON videos(availability);
@@ -0,0 +1,2 @@
+-- Digest of thumbnails kept in the external thumbnail store
+ALTER TABLE videos ADD COLUMN thumbnail_hash TEXT;
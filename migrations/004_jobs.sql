@@ -0,0 +1,25 @@
+-- Journal of bulk runs (history, playlist, lost) so they can be resumed
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running',
+    position INTEGER NOT NULL DEFAULT 0, -- Entries committed so far
+    entries INTEGER NOT NULL DEFAULT 0,
+    elapsed REAL NOT NULL DEFAULT 0,
+    started INTEGER DEFAULT (strftime('%s','now')),
+    finished INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS job_entries (
+    job INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    video TEXT,
+    time REAL, -- Watched or added timestamp
+    status TEXT NOT NULL DEFAULT 'pending',
+    PRIMARY KEY(job, position),
+    FOREIGN KEY(job) REFERENCES jobs(job_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS jobs_kind_source ON jobs(kind, source, status);
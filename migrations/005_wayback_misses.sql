@@ -0,0 +1,5 @@
+-- Videos the Wayback machine had no snapshot of when last checked
+CREATE TABLE IF NOT EXISTS wayback_misses (
+    video TEXT PRIMARY KEY NOT NULL,
+    checked INTEGER NOT NULL
+) WITHOUT ROWID;
@@ -0,0 +1,10 @@
+-- Recovery attempts of lost videos and when to try them again
+CREATE TABLE IF NOT EXISTS lost_attempts (
+    video TEXT PRIMARY KEY NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_attempt INTEGER,
+    last_error TEXT,
+    next_attempt INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY(video) REFERENCES videos(video_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lost_attempts_next ON lost_attempts(next_attempt);
@@ -0,0 +1,2 @@
+-- Fingerprint of the playlist source when it was last fully archived
+ALTER TABLE playlists ADD COLUMN fingerprint TEXT;
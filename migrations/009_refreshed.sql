@@ -0,0 +1,2 @@
+-- When the counters (views, likes, dislikes, rating) were last fetched
+ALTER TABLE videos ADD COLUMN refreshed INTEGER;
@@ -0,0 +1,95 @@
+-- Watch counts and watch time per day and category, and per channel and month,
+-- kept up to date by triggers so statistics don't join history with videos.
+-- Watches of videos that aren't archived count under an empty category and
+-- channel, and watched videos are counted whole
+CREATE TABLE IF NOT EXISTS watch_days (
+    day TEXT NOT NULL, -- YYYY-MM-DD (UTC)
+    category TEXT NOT NULL,
+    watches INTEGER NOT NULL,
+    duration INTEGER NOT NULL, -- Seconds
+    PRIMARY KEY(day, category)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS watch_channels (
+    channel TEXT NOT NULL,
+    month TEXT NOT NULL, -- YYYY-MM (UTC)
+    watches INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    PRIMARY KEY(channel, month)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS watch_channels_month ON watch_channels(month);
+
+CREATE TRIGGER IF NOT EXISTS watch_stats_history_insert AFTER INSERT ON history BEGIN
+    INSERT INTO watch_days SELECT date(new.watched, 'unixepoch'), coalesce(category, ''), 1, coalesce(duration, 0)
+        FROM (SELECT 1) LEFT JOIN videos ON video_id == new.video WHERE true
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_channels SELECT coalesce(channel, ''), strftime('%Y-%m', new.watched, 'unixepoch'), 1, coalesce(duration, 0)
+        FROM (SELECT 1) LEFT JOIN videos ON video_id == new.video WHERE true
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+END;
+CREATE TRIGGER IF NOT EXISTS watch_stats_history_delete AFTER DELETE ON history BEGIN
+    INSERT INTO watch_days SELECT date(old.watched, 'unixepoch'), coalesce(category, ''), -1, -coalesce(duration, 0)
+        FROM (SELECT 1) LEFT JOIN videos ON video_id == old.video WHERE true
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_channels SELECT coalesce(channel, ''), strftime('%Y-%m', old.watched, 'unixepoch'), -1, -coalesce(duration, 0)
+        FROM (SELECT 1) LEFT JOIN videos ON video_id == old.video WHERE true
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    DELETE FROM watch_days WHERE day == date(old.watched, 'unixepoch') AND watches == 0;
+    DELETE FROM watch_channels WHERE channel == coalesce((SELECT channel FROM videos WHERE video_id == old.video), '')
+        AND month == strftime('%Y-%m', old.watched, 'unixepoch') AND watches == 0;
+END;
+
+-- A video archived, changed or removed after it was watched moves its watches
+CREATE TRIGGER IF NOT EXISTS watch_stats_video_insert AFTER INSERT ON videos
+WHEN new.channel IS NOT NULL OR new.category IS NOT NULL OR new.duration IS NOT NULL BEGIN
+    INSERT INTO watch_days SELECT date(watched, 'unixepoch'), '', -count(*), 0 FROM history WHERE video == new.video_id GROUP BY 1
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_days SELECT date(watched, 'unixepoch'), coalesce(new.category, ''), count(*), count(*) * coalesce(new.duration, 0)
+        FROM history WHERE video == new.video_id GROUP BY 1
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_channels SELECT '', strftime('%Y-%m', watched, 'unixepoch'), -count(*), 0 FROM history WHERE video == new.video_id GROUP BY 2
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_channels SELECT coalesce(new.channel, ''), strftime('%Y-%m', watched, 'unixepoch'), count(*), count(*) * coalesce(new.duration, 0)
+        FROM history WHERE video == new.video_id GROUP BY 2
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    DELETE FROM watch_days WHERE day IN (SELECT date(watched, 'unixepoch') FROM history WHERE video == new.video_id) AND watches == 0;
+    DELETE FROM watch_channels WHERE channel == '' AND watches == 0;
+END;
+CREATE TRIGGER IF NOT EXISTS watch_stats_video_update AFTER UPDATE OF channel, category, duration ON videos
+WHEN old.channel IS NOT new.channel OR old.category IS NOT new.category OR old.duration IS NOT new.duration BEGIN
+    INSERT INTO watch_days SELECT date(watched, 'unixepoch'), coalesce(old.category, ''), -count(*), -count(*) * coalesce(old.duration, 0)
+        FROM history WHERE video == old.video_id GROUP BY 1
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_days SELECT date(watched, 'unixepoch'), coalesce(new.category, ''), count(*), count(*) * coalesce(new.duration, 0)
+        FROM history WHERE video == new.video_id GROUP BY 1
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_channels SELECT coalesce(old.channel, ''), strftime('%Y-%m', watched, 'unixepoch'), -count(*), -count(*) * coalesce(old.duration, 0)
+        FROM history WHERE video == old.video_id GROUP BY 2
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_channels SELECT coalesce(new.channel, ''), strftime('%Y-%m', watched, 'unixepoch'), count(*), count(*) * coalesce(new.duration, 0)
+        FROM history WHERE video == new.video_id GROUP BY 2
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    DELETE FROM watch_days WHERE day IN (SELECT date(watched, 'unixepoch') FROM history WHERE video == old.video_id) AND watches == 0;
+    DELETE FROM watch_channels WHERE channel == coalesce(old.channel, '') AND watches == 0;
+END;
+CREATE TRIGGER IF NOT EXISTS watch_stats_video_delete AFTER DELETE ON videos
+WHEN old.channel IS NOT NULL OR old.category IS NOT NULL OR old.duration IS NOT NULL BEGIN
+    INSERT INTO watch_days SELECT date(watched, 'unixepoch'), coalesce(old.category, ''), -count(*), -count(*) * coalesce(old.duration, 0)
+        FROM history WHERE video == old.video_id GROUP BY 1
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_days SELECT date(watched, 'unixepoch'), '', count(*), 0 FROM history WHERE video == old.video_id GROUP BY 1
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_channels SELECT coalesce(old.channel, ''), strftime('%Y-%m', watched, 'unixepoch'), -count(*), -count(*) * coalesce(old.duration, 0)
+        FROM history WHERE video == old.video_id GROUP BY 2
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    INSERT INTO watch_channels SELECT '', strftime('%Y-%m', watched, 'unixepoch'), count(*), 0 FROM history WHERE video == old.video_id GROUP BY 2
+        ON CONFLICT DO UPDATE SET watches = watches + excluded.watches, duration = duration + excluded.duration;
+    DELETE FROM watch_days WHERE day IN (SELECT date(watched, 'unixepoch') FROM history WHERE video == old.video_id) AND watches == 0;
+    DELETE FROM watch_channels WHERE channel == coalesce(old.channel, '') AND watches == 0;
+END;
+
+-- Count what is already archived
+INSERT INTO watch_days SELECT date(watched, 'unixepoch'), coalesce(category, ''), count(*), sum(coalesce(duration, 0))
+    FROM history LEFT JOIN videos ON video_id == history.video GROUP BY 1, 2;
+INSERT INTO watch_channels SELECT coalesce(channel, ''), strftime('%Y-%m', watched, 'unixepoch'), count(*), sum(coalesce(duration, 0))
+    FROM history LEFT JOIN videos ON video_id == history.video GROUP BY 1, 2;
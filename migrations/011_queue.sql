@@ -0,0 +1,14 @@
+-- Videos waiting for 'archive work' processes, a worker leases a few at a
+-- time and a lease that expires (the worker died) makes them available again
+CREATE TABLE IF NOT EXISTS queue (
+    video TEXT PRIMARY KEY NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending', -- pending, leased or failed
+    worker TEXT, -- host:pid holding the lease
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    added INTEGER DEFAULT (strftime('%s','now'))
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS queue_status ON queue(status, added);
+CREATE INDEX IF NOT EXISTS queue_worker ON queue(worker);
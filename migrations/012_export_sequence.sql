@@ -0,0 +1,25 @@
+-- Write order of videos, comments and tags for 'since' exports. Rowids are
+-- handed out again once the highest rows are deleted and VACUUM renumbers
+-- them, this counter only ever goes up
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY NOT NULL,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+
+ALTER TABLE videos ADD COLUMN seq INTEGER;
+ALTER TABLE comments ADD COLUMN seq INTEGER;
+ALTER TABLE video_tags ADD COLUMN seq INTEGER;
+
+-- Rowids are what earlier exports marked, keep them for existing rows
+UPDATE videos SET seq = rowid;
+UPDATE comments SET seq = rowid;
+UPDATE video_tags SET seq = id;
+INSERT INTO sequences SELECT 'export', max(
+    (SELECT coalesce(max(rowid), 0) FROM videos),
+    (SELECT coalesce(max(rowid), 0) FROM comments),
+    (SELECT coalesce(max(id), 0) FROM video_tags)
+);
+
+CREATE INDEX IF NOT EXISTS videos_seq ON videos(seq);
+CREATE INDEX IF NOT EXISTS comments_seq ON comments(seq);
+CREATE INDEX IF NOT EXISTS video_tags_seq ON video_tags(seq);
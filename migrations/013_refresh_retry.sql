@@ -0,0 +1,3 @@
+-- When a video whose counters couldn't be fetched is tried again, failures
+-- don't touch 'refreshed' so the video stays stale until it is refreshed
+ALTER TABLE videos ADD COLUMN refresh_retry INTEGER;
@@ -0,0 +1,133 @@
+import threading, requests, time, random, re, logging, urllib.parse, email.utils
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+THROTTLED = re.compile(r"HTTP Error 429|Too Many Requests|rate.?limit", re.IGNORECASE)
+
+class Throttled(requests.RequestException):
+    """The host asked us to slow down"""
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Exponential backoff with full jitter
+def backoff(attempt, base=1, cap=60):
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+# Seconds to wait from a Retry-After header (delay or HTTP date)
+def retry_after(value):
+    if not value: return None
+    if value.strip().isdigit(): return int(value)
+    try:
+        return max(0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Per host token buckets with an adaptive rate.
+
+    Every host starts at `rate` requests per second. When a host throttles
+    us its rate is halved and it is paused for its Retry-After delay (or an
+    exponential backoff), successful requests then slowly raise the rate
+    back up, so throughput settles just under the host's limit.
+    """
+    MIN_RATE = 0.05
+
+    def __init__(self, rate=5, burst=None):
+        self.rate, self.burst = rate, burst or rate
+        self.__hosts, self.__lock = {}, threading.Lock()
+
+    def __bucket(self, host):
+        if host not in self.__hosts:
+            self.__hosts[host] = {"rate": self.rate, "tokens": self.burst,
+                "updated": time.monotonic(), "paused": 0, "throttles": 0}
+        return self.__hosts[host]
+
+    def acquire(self, host):
+        while True:
+            with self.__lock:
+                bucket, now = self.__bucket(host), time.monotonic()
+                bucket["tokens"] = min(self.burst, bucket["tokens"] + (now - bucket["updated"]) * bucket["rate"])
+                bucket["updated"] = now
+                if now >= bucket["paused"] and bucket["tokens"] >= 1:
+                    bucket["tokens"] -= 1
+                    return
+                wait = max(bucket["paused"] - now, (1 - bucket["tokens"]) / bucket["rate"])
+            time.sleep(wait)
+
+    def throttled(self, host, delay=None):
+        with self.__lock:
+            bucket = self.__bucket(host)
+            bucket["rate"] = max(self.MIN_RATE, bucket["rate"] / 2)
+            bucket["tokens"] = 0
+            delay = delay if delay is not None else backoff(bucket["throttles"], cap=300)
+            bucket["paused"] = max(bucket["paused"], time.monotonic() + delay)
+            bucket["throttles"] += 1
+        logging.warning(f"Throttled by {host}, slowing down to {bucket['rate']:.2f} requests/sec")
+
+    def succeeded(self, host):
+        with self.__lock:
+            bucket = self.__bucket(host)
+            bucket["rate"] = min(self.rate, bucket["rate"] + self.rate / 20)
+            bucket["throttles"] = 0
+
+    def run(self, host, request, attempts=5):
+        # Call request() within the host's rate, retrying while it raises Throttled
+        for attempt in range(attempts):
+            self.acquire(host)
+            try:
+                result = request()
+            except Throttled as e:
+                self.throttled(host, e.retry_after)
+                if attempt == attempts-1: raise
+                continue
+            self.succeeded(host)
+            return result
+
+
+class Session:
+    """Shared HTTP session for thumbnails and RYD lookups.
+
+    Connections are kept alive and pooled per host so a bulk run only
+    pays the TCP+TLS handshake once per host, at most `connections`
+    are opened to the same host and workers wait for a free one.
+    Requests go through the rate limiter, 429 and 503 responses slow the
+    host down, connection errors and other 5xx are retried with backoff.
+    """
+    RETRY_STATUS = (500, 502, 504)
+    THROTTLE_STATUS = (429, 503)
+    HOSTS = 10 # Number of per-host pools kept around
+
+    def __init__(self, limiter, connections=4, timeout=5, retries=3):
+        self.limiter, self.timeout, self.connections, self.retries = limiter, timeout, connections, retries
+        self.__session, self.__lock = None, threading.Lock()
+
+    def __get_session(self):
+        with self.__lock:
+            if not self.__session:
+                retry = Retry(total=self.retries, backoff_factor=0.5, backoff_jitter=0.5,
+                    status_forcelist=self.RETRY_STATUS, allowed_methods=["GET"], raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=self.HOSTS, pool_maxsize=self.connections,
+                    pool_block=True, max_retries=retry)
+
+                self.__session = requests.Session()
+                self.__session.mount("https://", adapter)
+                self.__session.mount("http://", adapter)
+            return self.__session
+
+    def get(self, url, **kwargs):
+        host, timeout = urllib.parse.urlsplit(url).hostname, kwargs.pop("timeout", self.timeout)
+        def request():
+            response = self.__get_session().get(url, timeout=timeout, **kwargs)
+            if response.status_code in self.THROTTLE_STATUS:
+                raise Throttled(f"{host} responded {response.status_code}", retry_after(response.headers.get("Retry-After")))
+            return response
+        return self.limiter.run(host, request, self.retries+1)
+
+    def close(self):
+        with self.__lock:
+            if self.__session: self.__session.close()
+            self.__session = None
@@ -0,0 +1,51 @@
+import os, io, sys, copy, shutil, tempfile, unittest, contextlib
+from unittest import mock
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+
+def video(video_id, comments=2, tags=(), channel="UCsXVk37bltHxD1rDPwtNM8Q", category="Music", duration=300):
+    # What yt-dlp extracts, trimmed to what yark reads
+    return {"id": video_id, "fulltitle": f"Video {video_id}", "description": "description",
+        "channel_id": channel, "channel": "channel", "uploader_id": "@uploader",
+        "channel_url": f"https://www.youtube.com/channel/{channel}", "thumbnail": None,
+        "duration": duration, "availability": "public", "height": 1080, "width": 1920, "fps": 30,
+        "upload_date": "20200102", "filesize_approx": 10**7, "tags": list(tags),
+        "categories": [category], "view_count": 5000, "comments": [{"id": f"{video_id}.{n}",
+            "author_id": "@commenter", "author": "commenter", "text": "comment", "like_count": n,
+            "is_favorited": False, "author_is_uploader": False, "parent": "root", "timestamp": 1600000000 + n}
+            for n in range(comments)]}
+
+
+class Scratch(unittest.TestCase):
+    """Fresh archive in a scratch folder for every test.
+
+    The database opens on first use, yt-dlp returns the videos put in
+    self.videos and RYD has no votes, so nothing goes to the network.
+    """
+    def setUp(self):
+        self.cwd, self.scratch = os.getcwd(), tempfile.mkdtemp(prefix="yark-test-")
+        shutil.copy(os.path.join(REPO, "schema.sql"), self.scratch)
+        shutil.copytree(os.path.join(REPO, "migrations"), os.path.join(self.scratch, "migrations"))
+        os.chdir(self.scratch)
+
+        import database, cmds, utils
+        self.db, self.cmds, self.videos = database.db, cmds, {}
+        patches = [mock.patch.object(utils, "auto_confirm", True),
+            mock.patch.object(cmds.Archive, "_Archive__get_video", lambda archive, id: copy.deepcopy(self.videos.get(id))),
+            mock.patch.object(cmds.Archive, "_Archive__get_ryd", lambda archive, id: None)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.db.close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.scratch)
+
+    def run_command(self, command, *args):
+        # Output of the command, printed and returned
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = self.cmds.run(getattr(self.cmds, command)(), list(args))
+        return output.getvalue() + (result or "")
@@ -0,0 +1,52 @@
+import os, json, unittest
+from scratch import Scratch, video
+
+try: import pyarrow.parquet
+except ImportError: pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class ParquetExport(Scratch):
+    def setUp(self):
+        super().setUp()
+        self.db.execute("INSERT INTO history(video, watched) VALUES ('hAjhhGCC_BA', 1609495200.123), ('hAjhhGCC_BA', 1609495300)")
+        self.db.commit()
+
+    def test_fractional_timestamps(self):
+        self.run_command("Export", "parquet", "out", "history")
+        self.run_command("Export", "ndjson", "out", "history")
+
+        parquet = pyarrow.parquet.read_table("out/history.parquet").column("watched").to_pylist()
+        with open("out/history.ndjson") as ndjson: lines = [json.loads(line)["watched"] for line in ndjson]
+        self.assertEqual(parquet, [1609495200.123, 1609495300])
+        self.assertEqual(parquet, lines)
+
+
+class SinceExport(Scratch):
+    def exported(self, table):
+        # Every row exported to out so far, in any file
+        rows = []
+        for name in sorted(os.listdir("out")):
+            if name.startswith(f"{table}-"):
+                with open(os.path.join("out", name)) as ndjson: rows += [json.loads(line) for line in ndjson]
+        return rows
+
+    def test_deleted_rows_are_not_reused(self):
+        # Rowids of the newest video's comments and tags are handed out again once it's unarchived
+        self.videos = {"aaaaaaaaaaa": video("aaaaaaaaaaa", 3, ["one", "two"]), "bbbbbbbbbbb": video("bbbbbbbbbbb", 2, ["three"]),
+            "ccccccccccc": video("ccccccccccc", 4, ["four", "five"])}
+        self.run_command("Archive", "video", "aaaaaaaaaaa")
+        self.run_command("Archive", "video", "bbbbbbbbbbb")
+        self.run_command("Export", "ndjson", "out", "since", "videos", "comments", "tags")
+        self.run_command("Unarchive", "video", "bbbbbbbbbbb")
+        self.run_command("Archive", "video", "ccccccccccc")
+        self.run_command("Export", "ndjson", "out", "since", "videos", "comments", "tags")
+
+        comments = sorted(row["comment_id"] for row in self.exported("comments"))
+        self.assertEqual(comments, [f"{id * 11}.{n}" for id, count in (("a", 3), ("b", 2), ("c", 4)) for n in range(count)])
+        self.assertEqual(sorted(row["tag"] for row in self.exported("tags")), ["five", "four", "one", "three", "two"])
+        self.assertEqual(sorted(row["video_id"] for row in self.exported("videos")), ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import csv, time, unittest
+from unittest import mock
+from scratch import Scratch, video
+
+
+class Queue(Scratch):
+    def setUp(self):
+        super().setUp()
+        self.videos = {id * 11: video(id * 11) for id in "abcd"}
+        patch = mock.patch.dict(self.cmds.configs.configs, {"queue": True, "workers": 3})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def queued(self):
+        return {row["video"][0]: row for row in self.db.execute("SELECT * FROM queue")}
+
+    def archived(self):
+        return {row["video_id"][0] for row in self.db.execute("SELECT video_id FROM videos")}
+
+    def test_queue_and_work(self):
+        with open("mix videos.csv", "w", newline="") as playlist:
+            csv.writer(playlist).writerows([["Video ID", "Playlist Video Creation Timestamp"]] + [[id, ""] for id in self.videos])
+        self.assertIn("Video queued", self.run_command("Archive", "playlist", "mix", "videos.csv"))
+        self.assertEqual(set(self.queued()), set("abcd"))
+        self.assertEqual(self.archived(), set())
+
+        self.assertIn("archived 4 video(s)", self.run_command("Archive", "work"))
+        self.assertEqual(self.queued(), {})
+        self.assertEqual(self.archived(), set("abcd"))
+
+    def test_expired_leases(self):
+        # A dead worker's lease expired, a live worker's didn't
+        now = time.time()
+        self.db.executemany("INSERT INTO queue(video, status, worker, lease_expires, attempts) VALUES (?,?,?,?,?)", [
+            ("aaaaaaaaaaa", "leased", "dead:1", now - 10, 1), ("bbbbbbbbbbb", "leased", "alive:2", now + 600, 1),
+            ("ccccccccccc", "pending", None, None, 0)])
+        self.db.commit()
+
+        self.run_command("Archive", "work")
+        self.assertEqual(self.archived(), set("ac"))
+        self.assertEqual(self.queued()["b"]["worker"], "alive:2")
+
+    def test_failures(self):
+        def fetch(archive, video_id):
+            if video_id == "bbbbbbbbbbb": raise ValueError("broken")
+            return archive._Archive__refine_metadata(video(video_id), None)
+        self.db.executemany("INSERT INTO queue(video) VALUES (?)", [("aaaaaaaaaaa",), ("bbbbbbbbbbb",)])
+        self.db.commit()
+
+        with mock.patch.object(self.cmds.Archive, "_Archive__fetch", fetch):
+            for attempt in range(1, 4):
+                self.run_command("Archive", "work")
+                # Not handed out again before its retry delay
+                self.assertIn("0 video(s)", self.run_command("Archive", "work"))
+                self.assertEqual(self.queued()["b"]["attempts"], attempt)
+                self.db.execute("UPDATE queue SET lease_expires = 0")
+                self.db.commit()
+
+        self.assertEqual((self.queued()["b"]["status"], self.queued()["b"]["error"]), ("failed", "ValueError: broken"))
+        self.assertNotIn("b", self.archived())
+        self.assertIn("0 video(s)", self.run_command("Archive", "work"))
+        self.assertIn("1 failed video(s) queued again", self.run_command("Archive", "queue", "retry"))
+        self.assertEqual((self.queued()["b"]["status"], self.queued()["b"]["attempts"]), ("pending", 0))
+
+    def test_retry_in_same_run(self):
+        # Once its retry delay is over the same worker can claim a failed video again,
+        # one at a time so the worker doesn't run out of videos to claim meanwhile
+        self.cmds.configs.configs["workers"] = 1
+        failures = ["bbbbbbbbbbb"]
+        def fetch(archive, video_id):
+            if video_id in failures:
+                failures.remove(video_id)
+                raise ValueError("broken")
+            return archive._Archive__refine_metadata(video(video_id), None)
+        self.db.executemany("INSERT INTO queue(video) VALUES (?)", [("aaaaaaaaaaa",), ("bbbbbbbbbbb",)])
+        self.db.commit()
+
+        with mock.patch.object(self.cmds.Archive, "_Archive__fetch", fetch), mock.patch("cmds.archive.QUEUE_RETRY", 0):
+            self.assertIn("archived 2 video(s)", self.run_command("Archive", "work"))
+        self.assertEqual(self.queued(), {})
+
+    def test_hand_back(self):
+        # A worker stopped midway hands back the videos it leased
+        self.db.executemany("INSERT INTO queue(video) VALUES (?)", [(id,) for id in sorted(self.videos)])
+        self.db.commit()
+        store = self.cmds.Archive._Archive__store
+        def interrupted(archive, video_id, v):
+            if video_id == "bbbbbbbbbbb": raise KeyboardInterrupt
+            return store(archive, video_id, v)
+
+        with mock.patch.object(self.cmds.Archive, "_Archive__store", interrupted), self.assertRaises(KeyboardInterrupt):
+            self.run_command("Archive", "work")
+        self.assertEqual(self.archived(), {"a"})
+        self.assertEqual({id: (row["status"], row["worker"], row["attempts"]) for id, row in self.queued().items()},
+            {id: ("pending", None, 0) for id in "bcd"})
+
+        self.run_command("Archive", "work")
+        self.assertEqual(self.archived(), set("abcd"))
+
+
+if __name__ == "__main__":
+    unittest.main()
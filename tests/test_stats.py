@@ -0,0 +1,57 @@
+import unittest
+from scratch import Scratch, video
+
+MATCH = "Statistics match the history."
+
+
+class WatchStats(Scratch):
+    def setUp(self):
+        super().setUp()
+        self.videos = {"aaaaaaaaaaa": video("aaaaaaaaaaa", duration=100), "bbbbbbbbbbb": video("bbbbbbbbbbb", category="Gaming", duration=200)}
+        self.watch(("aaaaaaaaaaa", 1609459200), ("aaaaaaaaaaa", 1609545600), ("bbbbbbbbbbb", 1612137600), ("xxxxxxxxxxx", 1609459300))
+
+    def watch(self, *watches):
+        self.db.executemany("INSERT INTO history(video, watched) VALUES (?,?)", watches)
+        self.db.commit()
+
+    def check(self):
+        self.assertIn(MATCH, self.run_command("Stats", "check"))
+
+    def test_archive_update_unarchive(self):
+        self.check()
+        self.run_command("Archive", "video", "aaaaaaaaaaa")
+        self.run_command("Archive", "video", "bbbbbbbbbbb")
+        self.check()
+        self.watch(("bbbbbbbbbbb", 1609459400))
+        self.check()
+
+        # Archived again with a new channel, category and duration
+        self.videos["aaaaaaaaaaa"] |= {"channel_id": "UCAAAAAAAAAAAAAAAAAAAAAA", "channel_url": "https://www.youtube.com/channel/UCAAAAAAAAAAAAAAAAAAAAAA",
+            "categories": ["Education"], "duration": 150}
+        self.assertIn("updated", self.run_command("Archive", "video", "aaaaaaaaaaa"))
+        self.check()
+        self.videos["aaaaaaaaaaa"]["duration"] = 120
+        self.run_command("Archive", "video", "aaaaaaaaaaa")
+        self.check()
+
+        self.run_command("Unarchive", "video", "bbbbbbbbbbb")
+        self.check()
+        self.db.execute("DELETE FROM history WHERE video == 'aaaaaaaaaaa' AND watched == 1609459200")
+        self.db.commit()
+        self.check()
+
+        self.assertEqual(self.db.execute("SELECT count(*) AS n FROM watch_days WHERE watches == 0").fetchone()["n"], 0)
+        totals = self.db.execute("SELECT sum(watches) AS watches, sum(duration) AS duration FROM watch_days").fetchone()
+        self.assertEqual((totals["watches"], totals["duration"]), (4, 120))
+
+    def test_rebuild(self):
+        self.run_command("Archive", "video", "aaaaaaaaaaa")
+        self.db.execute("DELETE FROM watch_channels")
+        self.db.commit()
+        self.assertIn("differ", self.run_command("Stats", "check"))
+        self.run_command("Stats", "rebuild")
+        self.check()
+
+
+if __name__ == "__main__":
+    unittest.main()
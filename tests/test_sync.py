@@ -0,0 +1,51 @@
+import csv, unittest
+from scratch import Scratch, video
+
+TIMES = {n: f"2021-01-0{n}T00:00:00+00:00" for n in range(1, 10)}
+
+
+class PlaylistSync(Scratch):
+    def setUp(self):
+        super().setUp()
+        self.videos = {id * 11: video(id * 11) for id in "abcde"}
+
+    def sync(self, entries):
+        # Takeout playlist CSV, an empty time is what YouTube playlists give
+        with open("mix videos.csv", "w", newline="") as playlist:
+            writer = csv.writer(playlist)
+            writer.writerow(["Video ID", "Playlist Video Creation Timestamp"])
+            writer.writerows((id * 11, TIMES.get(time, "")) for id, time in entries)
+        return self.run_command("Archive", "sync", "mix", "videos.csv")
+
+    def rows(self):
+        return [(row["pl"], row["video"][0], row["added"]) for row in
+            self.db.execute("SELECT pl, video, added FROM playlist_videos WHERE playlist == 'PLLOCAL_mix' ORDER BY pl")]
+
+    def added(self, time):
+        return self.db.execute("SELECT unixepoch(?) AS time", (TIMES[time],)).fetchone()["time"]
+
+    def test_moved_videos_keep_added(self):
+        self.sync([("a", 1), ("b", 2), ("c", 3), ("d", 4)])
+        first = self.rows()
+        output = self.sync([("a", 1), ("c", None), ("b", None), ("e", 5)])
+
+        self.assertIn("4 videos: 1 unchanged, 1 added, 1 removed, 2 moved", output)
+        self.assertEqual([(video, added) for pl, video, added in self.rows()],
+            [("a", self.added(1)), ("c", self.added(3)), ("b", self.added(2)), ("e", self.added(5))])
+        self.assertEqual(self.rows()[0], first[0]) # Rows before the first move aren't touched
+
+    def test_repeated_videos(self):
+        self.sync([("a", 1), ("b", 2), ("a", 3)])
+        self.sync([("b", None), ("a", None), ("a", None), ("a", 4)])
+        self.assertEqual([(video, added) for pl, video, added in self.rows()],
+            [("b", self.added(2)), ("a", self.added(1)), ("a", self.added(3)), ("a", self.added(4))])
+
+    def test_unchanged(self):
+        self.sync([("a", 1), ("b", 2)])
+        rows = self.rows()
+        self.assertIn("is unchanged", self.sync([("a", 1), ("b", 2)]))
+        self.assertEqual(self.rows(), rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+import io, json, unittest
+import scratch # Puts the repository on the path
+import utils
+
+
+class JsonItems(unittest.TestCase):
+    def items(self, raw, chunk_size):
+        return list(utils.json_items(io.BytesIO(raw), chunk_size))
+
+    def test_chunk_boundaries(self):
+        # Every item split at every possible place
+        items = [12345, 678, -2.5e-3, True, None, "a, b]", {"time": 1609495200.123}, [1, [2]], "é"]
+        raw = json.dumps(items).encode()
+        for chunk_size in range(1, len(raw) + 1):
+            self.assertEqual(self.items(raw, chunk_size), items, f"chunk_size={chunk_size}")
+
+    def test_invalid(self):
+        for raw in (b"{}", b"[1 2]", b"[1, 2", b"[{\"a\": 1}"):
+            with self.assertRaises(ValueError): self.items(raw, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import os, hashlib
+import utils
+
+
+class ThumbnailStore:
+    """Content addressed thumbnail files.
+
+    Thumbnails are saved under their SHA-256 digest, in a two level
+    directory tree (ab/cd/abcd...), so identical thumbnails are only
+    stored once and the database only keeps the digest.
+    """
+    def __init__(self, root="thumbnail_store"):
+        self.root = root
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def put(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path): return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with utils.atomic_path(path) as temporary, open(temporary, "wb") as file: file.write(data)
+        return digest
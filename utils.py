@@ -1,15 +1,18 @@
-import time, re, logging, math
+import os, time, re, logging, math, json, csv, codecs, datetime, hashlib, threading, contextlib
 from colorama import Style, Fore, Back
 
 # CONSTANTS
 RYD_API = "https://returnyoutubedislikeapi.com/"
 WAYBACK = "https://web.archive.org/web/"
+WAYBACK_CDX = "https://web.archive.org/cdx/search/cdx"
 YOUTUBE = "https://www.youtube.com/"
 DEFAULT_DESC = "Enjoy the videos and music you love, upload original content, and share it all with friends, family, and the world on YouTube."
 DELETE = "\033[K\033[A"*2
 
 # https://stackoverflow.com/a/14693789/12727730
 ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+# Whitespace between JSON values
+JSON_SPACE = re.compile(r"[ \t\r\n]*")
 
 YES = ["yes", "y", "yep", "sure", "ight", "ok", "okey", "go ahead", "cool", "ye", "yeh", "yee", "do it", "why not"]
 MAYBE = ["maybe", "perhaps", "possibly", "conceivably", "probably"]
@@ -38,17 +41,101 @@ def format_time(tim):
     if tim % 1 == 0: tim = int(tim)
     return {"time":tim, "unit":TIMEUNITS[unit]}
 
-def step_format(position, length, started):
-    eta = format_time((time.perf_counter() - started) * (length / position - 1))
-    print(f"\n{color(f'[{position} / {length}]', 'cyan')} ETA: {eta['time']} {eta['unit']}")
+# Timestamps come as YYYYMMDD from yt-dlp and ISO 8601 from takeout files,
+# dateutil's much slower parser is only used for anything else.
+def parse_timestamp(text):
+    try:
+        if len(text) == 8 and text.isdigit():
+            return datetime.datetime(int(text[:4]), int(text[4:6]), int(text[6:])).timestamp()
+        return datetime.datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        from dateutil.parser import parse
+        return parse(text).timestamp()
+
+
+SIZEUNITS = ["B", "KB", "MB", "GB", "TB"]
+def format_size(size):
+    unit = 0
+    while size >= 1024 and unit < len(SIZEUNITS)-1:
+        size /= 1024
+        unit += 1
+    return f"{math.floor(size*10)/10 if unit else size} {SIZEUNITS[unit]}"
+
+def step_format(position, length, started, size=False):
+    eta = format_time((time.perf_counter() - started) * (length / max(position, 1) - 1))
+    step = f"{format_size(position)} / {format_size(length)}" if size else f"{position} / {length}"
+    print(f"\n{color(f'[{step}]', 'cyan')} ETA: {eta['time']} {eta['unit']}")
+
+# Answer to give instead of asking (True/False), set by yark.py --yes/--no
+auto_confirm = None
 
 def user_confirm():
+    if auto_confirm is not None:
+        print(f"{color('[', 'red')}{color('confirm', 'red', True)}{color(']:', 'red')} {'yes' if auto_confirm else 'no'}")
+        return auto_confirm
     doit = input(f"{color('[', 'red')}{color('confirm', 'red', True)}{color(']:', 'red')} ").lower()
     if doit in YES: return True
     elif doit in MAYBE: print("I'll let you think about it.")
     elif doit not in NO: print("What ?")
     return False
 
+# Stream the items of a JSON array from a binary file, one at a time.
+# file.tell() gives the bytes consumed so far.
+def json_items(file, chunk_size=1 << 16):
+    decoder, text = json.JSONDecoder(), codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, pos, opened, eof = "", 0, False, False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,": pos += 1
+        if pos < len(buffer):
+            if not opened:
+                if buffer[pos] != "[": raise ValueError("Expected a JSON array")
+                opened, pos = True, pos+1
+                continue
+            if buffer[pos] == "]": return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Item continues in the next chunk
+                if eof: raise
+            else:
+                # Numbers can run on into the next chunk too, an item is
+                # only complete once the ',' or ']' after it was read
+                after = JSON_SPACE.match(buffer, end).end()
+                if after < len(buffer) and buffer[after] in ",]":
+                    pos = end
+                    yield item
+                    continue
+                if eof: raise ValueError("Expected ',' or ']' after an array item")
+        elif eof: raise ValueError("Unexpected end of JSON array")
+
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + text.decode(chunk, final=eof), 0
+
+# Temporary path next to a file, renamed to it once written so readers never
+# see partial files. Named after the writer so concurrent writers don't collide
+@contextlib.contextmanager
+def atomic_path(path):
+    temporary = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        yield temporary
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary): os.remove(temporary)
+        raise
+
+# Stream the rows of a CSV from a binary file, file.tell() stays usable
+def csv_rows(file, delimiter=","):
+    return csv.DictReader((line.decode("utf-8-sig") for line in file), delimiter=delimiter)
+
+# Hash of a binary file's content, the file is rewound afterwards
+def fingerprint(file, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    while chunk := file.read(chunk_size): digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
 # Custom logger
 class YtLogger(object):
     def __cleanup(self, msg):
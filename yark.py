@@ -1,36 +1,41 @@
-import sys, cmds, logging
+import sys, cmds, logging, argparse, json, time, contextlib
+import utils
 from utils import color
 
 
-# Initialize logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="[%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("debug.log"),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+def setup_logging(stream):
+    # Initialize logging
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="[%(levelname)s] %(message)s",
+        handlers=[
+            logging.FileHandler("debug.log"),
+            logging.StreamHandler(stream)
+        ]
+    )
 
-def main():
+def execute(args):
+    cmd = args.pop(0).capitalize()
+    try:
+        # Check if command exists
+        cmd = getattr(cmds, cmd)
+        if type(cmd) != type: raise TypeError
+    except (AttributeError, TypeError):
+        raise Exception(f"Command {cmd} does not exist.")
+
+    # Run command and return its return value
+    return cmds.run(cmd(), args)
+
+def interactive():
     print(color("[ YARK ]\n", "red"))
 
     while True:
         try:
             args = input("> ").split()
             if len(args) == 0: continue
-            cmd = args.pop(0).capitalize()
-            if cmd == "Exit": break
-
-            try:
-                # Check if command exists
-                cmd = getattr(cmds, cmd)
-                if type(cmd) != type: raise TypeError
-            except (AttributeError, TypeError):
-                raise Exception(f"Command {cmd} does not exist.")
-
-            # Run command and print return value
-            if rtn := cmds.run(cmd(), args):
+            if args[0].lower() == "exit": break
+
+            if rtn := execute(args):
                 print(rtn)
         except Exception as e:
             print(color(e, "red"), end="\n")
@@ -40,6 +45,65 @@ def main():
 
         print()
 
+def batch(lines, as_json):
+    # Run one command per line in this process, returns whether all succeeded
+    succeeded = True
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"): continue
+        if line.lower() == "exit": break
+
+        result, started = {"command": line}, time.perf_counter()
+        try:
+            # Keep stdout for the results when they are JSON
+            with contextlib.redirect_stdout(sys.stderr) if as_json else contextlib.nullcontext():
+                result["result"] = execute(line.split())
+            result["ok"] = True
+        except Exception as e:
+            result |= {"ok": False, "error": str(e), "type": type(e).__name__}
+            succeeded = False
+        result["seconds"] = round(time.perf_counter() - started, 3)
+
+        if as_json: print(json.dumps(result, default=str), flush=True)
+        elif not result["ok"]: print(color(result["error"], "red"))
+        elif result["result"]: print(result["result"])
+    return succeeded
+
+def main():
+    parser = argparse.ArgumentParser(description="Youtube Archive", epilog="Without a command or script, "
+        "commands are read from stdin when it isn't a terminal, otherwise yark starts interactively.")
+    parser.add_argument("command", nargs="*", help="a single command to run, eg.: archive video hAjhhGCC_BA")
+    parser.add_argument("-f", "--file", help="run the commands in a file, one per line ('-' for stdin)")
+    answer = parser.add_mutually_exclusive_group()
+    answer.add_argument("-y", "--yes", action="store_true", help="answer yes to every confirmation")
+    answer.add_argument("-n", "--no", action="store_true", help="answer no to every confirmation")
+    parser.add_argument("--json", action="store_true", help="print one JSON result per command")
+    options = parser.parse_args()
+
+    if options.command: lines = [" ".join(options.command)]
+    elif options.file == "-" or (not options.file and not sys.stdin.isatty()): lines = sys.stdin
+    elif options.file: lines = None # Opened below
+    else:
+        setup_logging(sys.stdout)
+        return interactive()
+
+    # Confirmations can't be asked for without a terminal (or when it holds the commands)
+    if options.yes or options.no: utils.auto_confirm = options.yes
+    elif lines is sys.stdin or not sys.stdin.isatty(): utils.auto_confirm = False
+
+    setup_logging(sys.stderr if options.json else sys.stdout)
+    try:
+        with open(options.file, "r") if lines is None else contextlib.nullcontext(lines) as lines:
+            succeeded = batch(lines, options.json)
+    except OSError as e:
+        # Reported like a failed command
+        error = {"file": options.file, "ok": False, "error": f"Cannot read {options.file}: {e.strerror}", "type": type(e).__name__}
+        print(json.dumps(error) if options.json else color(error["error"], "red"))
+        succeeded = False
+    except KeyboardInterrupt:
+        succeeded = False
+    sys.exit(0 if succeeded else 1)
+
 
 if __name__ == "__main__":
     main()